@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('static', 'static')],
-    hiddenimports=['pymssql', 'sqlalchemy.dialects.mssql', 'pkg_resources.py2_warn', 'waitress', 'waitress.server', 'flask', 'flask.sessions', 'werkzeug.security'],
+    hiddenimports=['pymssql', 'sqlalchemy', 'sqlalchemy.dialects.mssql', 'numpy', 'pandas', 'aggregation', 'array_fetch', 'metrics', 'output_formats', 'pkg_resources.py2_warn', 'waitress', 'waitress.server', 'flask', 'flask.sessions', 'werkzeug.security'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=['add_lib.py'],
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# optional: psutil reads the physical memory on Windows, where os.sysconf does not exist
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def physical_memory():
+    # total RAM in bytes, None when the platform offers no way to read it
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class AdmissionRejected(Exception):
+    # status is 429 when the queue is full and 503 when waiting for memory timed out
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    # reserves an estimated number of bytes per conversion against a memory budget. Conversions that
+    # do not fit wait in a bounded queue; a conversion larger than the whole budget runs only alone.
+    # A budget of 0 admits everything.
+
+    def __init__(self, budget, max_queued, queue_timeout, retry_after):
+        self.budget = budget
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.reserved = 0
+        self.running = 0
+        # requests waiting under queue_timeout, and background jobs (block=True) waiting without a limit;
+        # only the first count against max_queued, so a queued background batch never causes a 429
+        self.queued = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {429: 0, 503: 0}
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, estimate, block=False):
+        # requests queue for at most queue_timeout; block=True (background jobs) waits as long as it takes
+        if not self.budget:
+            yield 0
+            return
+        estimate = min(max(int(estimate or 0), 0), self.budget)
+        with self.condition:
+            if not self._fits(estimate):
+                if not block and self.queued >= self.max_queued:
+                    self.rejected[429] += 1
+                    raise AdmissionRejected(
+                        f"Server is busy with other conversions (needs ~{estimate / 2**20:,.0f} MiB, "
+                        f"{(self.budget - self.reserved) / 2**20:,.0f} MiB free). Try again shortly.",
+                        429, self.retry_after,
+                    )
+                if block:
+                    self.waiting += 1
+                else:
+                    self.queued += 1
+                try:
+                    deadline = None if block else time.monotonic() + self.queue_timeout
+                    while not self._fits(estimate):
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self.rejected[503] += 1
+                            raise AdmissionRejected(
+                                f"Timed out after {self.queue_timeout}s waiting for memory for this conversion. Try again later.",
+                                503, self.retry_after,
+                            )
+                        self.condition.wait(remaining)
+                finally:
+                    if block:
+                        self.waiting -= 1
+                    else:
+                        self.queued -= 1
+            self.reserved += estimate
+            self.running += 1
+            self.admitted += 1
+        logger.info(f"Admitted conversion needing ~{estimate / 2**20:,.0f} MiB ({self.reserved / 2**20:,.0f} of {self.budget / 2**20:,.0f} MiB reserved)")
+        try:
+            yield estimate
+        finally:
+            with self.condition:
+                self.reserved -= estimate
+                self.running -= 1
+                self.condition.notify_all()
+
+    def _fits(self, estimate):
+        # caller holds the condition; an empty controller admits anything, however large
+        return self.running == 0 or self.reserved + estimate <= self.budget
+
+    def stats(self):
+        with self.condition:
+            return {
+                'budget_bytes': self.budget,
+                'reserved_bytes': self.reserved,
+                'running': self.running,
+                'queued': self.queued,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+            }
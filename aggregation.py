@@ -0,0 +1,255 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+AGGREGATION_ENGINES = ('numpy', 'pandas')
+
+
+def aggregate_plt(df, period_col, event_col, loss_col, eventdate_col=None, engine='numpy'):
+    # same frame as df.groupby([period, event]).agg({loss: 'sum', eventdate: 'first'}).reset_index()
+    if engine not in AGGREGATION_ENGINES:
+        raise ValueError(f"Unknown aggregation engine '{engine}'. Use one of {AGGREGATION_ENGINES}.")
+
+    if engine == 'numpy':
+        ylt_df = numpy_aggregate_plt(df, period_col, event_col, loss_col, eventdate_col)
+        if ylt_df is not None:
+            return ylt_df
+        logger.info("Column dtypes not supported by the NumPy kernel, using pandas groupby")
+
+    return pandas_aggregate_plt(df, period_col, event_col, loss_col, eventdate_col)
+
+
+def pandas_aggregate_plt(df, period_col, event_col, loss_col, eventdate_col=None):
+    agg_rules = {loss_col: 'sum'}  # sum up all losses for the same event in the same year
+    if eventdate_col:
+        agg_rules[eventdate_col] = 'first'
+    return df.groupby([period_col, event_col]).agg(agg_rules).reset_index()
+
+
+def _integer_keys(values):
+    # int64 view of a key column plus its null mask, or None when the values are not whole numbers
+    if values.dtype.kind == 'i':
+        return values.astype(np.int64, copy=False), None
+    if values.dtype.kind == 'u':
+        if len(values) and values.max() >= 2**63:
+            return None
+        return values.astype(np.int64), None
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        present = values[~missing]
+        if not np.array_equal(present, np.floor(present)) or (len(present) and np.abs(present).max() >= 2**62):
+            return None
+        return np.where(missing, 0, values).astype(np.int64), missing
+    return None
+
+
+def sort_plt_keys(period, event):
+    # packs (period, event) into one int64 key when the ranges allow it, otherwise falls back to lexsort;
+    # data that already arrives ORDER BY period, event skips the sort entirely.
+    # Returns the sort order (None when presorted), group start offsets, a group id per sorted row
+    # and the period/event of every group.
+    period_min, period_max = int(period.min()), int(period.max())
+    event_min, event_max = int(event.min()), int(event.max())
+    event_span = event_max - event_min + 1
+
+    if (period_max - period_min + 1) * event_span < 2**63:
+        key = (period - period_min) * event_span + (event - event_min)
+        if np.all(key[1:] >= key[:-1]):
+            order = None
+        else:
+            order = np.argsort(key, kind='stable')
+            key = key[order]
+        boundaries = key[1:] != key[:-1]
+        starts = np.flatnonzero(np.concatenate(([True], boundaries)))
+        # decode the keys instead of gathering the original columns again
+        group_period, group_event = np.divmod(key[starts], event_span)
+        group_period += period_min
+        group_event += event_min
+    else:
+        order = np.lexsort((event, period))
+        period, event = period[order], event[order]
+        boundaries = (period[1:] != period[:-1]) | (event[1:] != event[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], boundaries)))
+        group_period, group_event = period[starts], event[starts]
+
+    group_ids = np.cumsum(np.concatenate(([0], boundaries)))
+    return order, starts, group_ids, group_period, group_event
+
+
+def kahan_group_sum(values, starts, group_ids):
+    # replicates pandas' compensated group_sum: NaNs are skipped and each group is summed in row order.
+    # Rows are processed one rank-within-group at a time so every group is touched once per pass.
+    n_groups = len(starts)
+    sums = np.zeros(n_groups, dtype=values.dtype)
+    compensation = np.zeros(n_groups, dtype=values.dtype)
+
+    valid = ~np.isnan(values)
+    if valid.all():
+        run_starts = starts
+    else:
+        valid = np.flatnonzero(valid)
+        if len(valid) == 0:
+            return sums
+        group_ids = group_ids[valid]
+        values = values[valid]
+        run_starts = np.flatnonzero(np.concatenate(([True], group_ids[1:] != group_ids[:-1])))
+
+    new_run = np.zeros(len(values), dtype=bool)
+    new_run[run_starts] = True
+    rest = np.flatnonzero(~new_run)
+
+    passes = [run_starts]
+    if len(rest):
+        # rank of every repeated row within its group; most PLT groups hold a single row
+        run_index = np.cumsum(new_run) - 1
+        rank = rest - run_starts[run_index[rest]]
+        rank = rank.astype(np.uint16) if rank.max() < 2**16 else rank
+        by_rank = rest[np.argsort(rank, kind='stable')]
+        offsets = np.cumsum(np.bincount(rank))
+        passes.extend(by_rank[offsets[k - 1]:offsets[k]] for k in range(1, len(offsets)))
+
+    with np.errstate(invalid='ignore'):
+        # +/-inf turns the compensation into NaN exactly as it does in pandas
+        for selected in passes:
+            group = group_ids[selected]
+            y = values[selected] - compensation[group]
+            t = sums[group] + y
+            compensation[group] = t - sums[group] - y
+            sums[group] = t
+
+    return sums
+
+
+def first_valid(values, group_ids, n_groups):
+    # first non-null value per group, missing groups filled with the column's null value
+    valid = np.flatnonzero(~pd.isna(values))
+    indexer = np.full(n_groups, -1, dtype=np.intp)
+    if len(valid):
+        groups = group_ids[valid]
+        first = np.concatenate(([True], groups[1:] != groups[:-1]))
+        indexer[groups[first]] = valid[first]
+    return pd.api.extensions.take(values, indexer, allow_fill=True)
+
+
+def numpy_aggregate_plt(df, period_col, event_col, loss_col, eventdate_col=None):
+    return numpy_aggregate_arrays(
+        df[period_col].to_numpy(), df[event_col].to_numpy(), df[loss_col].to_numpy(),
+        df[eventdate_col].array if eventdate_col else None,
+        period_col, event_col, loss_col, eventdate_col,
+    )
+
+
+def numpy_aggregate_arrays(period_values, event_values, loss_values, eventdate_values, period_col, event_col, loss_col, eventdate_col=None):
+    # the kernel on bare column arrays; eventdate_values is a pandas array (DatetimeArray) or None
+    period_keys = _integer_keys(period_values)
+    event_keys = _integer_keys(event_values)
+    if period_keys is None or event_keys is None or loss_values.dtype.kind not in 'iufb':
+        return None
+
+    period, period_missing = period_keys
+    event, event_missing = event_keys
+
+    # groupby drops rows with a null key
+    missing = None
+    if period_missing is not None or event_missing is not None:
+        missing = np.zeros(len(period), dtype=bool)
+        for mask in (period_missing, event_missing):
+            if mask is not None:
+                missing |= mask
+        if missing.any():
+            keep = ~missing
+            period, event, loss_values = period[keep], event[keep], loss_values[keep]
+            if eventdate_values is not None:
+                eventdate_values = eventdate_values[keep]
+
+    if len(period) == 0:
+        return None
+
+    order, starts, group_ids, group_period, group_event = sort_plt_keys(period, event)
+    if order is not None:
+        loss_values = loss_values[order]
+        if eventdate_values is not None:
+            eventdate_values = eventdate_values.take(order)
+    n_groups = len(starts)
+
+    if loss_values.dtype.kind == 'f':
+        loss_sums = kahan_group_sum(loss_values, starts, group_ids)
+    else:
+        # integer sums are exact in any order
+        sum_dtype = np.uint64 if loss_values.dtype.kind == 'u' else np.int64
+        loss_sums = np.add.reduceat(loss_values.astype(sum_dtype, copy=False), starts)
+
+    ylt_df = pd.DataFrame({
+        period_col: group_period.astype(period_values.dtype, copy=False),
+        event_col: group_event.astype(event_values.dtype, copy=False),
+        loss_col: loss_sums,
+    })
+    if eventdate_col:
+        ylt_df[eventdate_col] = first_valid(eventdate_values, group_ids, n_groups)
+    return ylt_df
+
+
+class PLTAggregator:
+    # folds PLT chunks into a running (period, event) -> loss sum / first eventdate table,
+    # so memory scales with the number of distinct pairs instead of the raw row count
+
+    def __init__(self, period_col, event_col, loss_col, eventdate_col=None, engine='numpy', compact_rows=1000000):
+        self.columns = (period_col, event_col, loss_col, eventdate_col)
+        self.engine = engine
+        self.compact_rows = compact_rows
+        self.accumulated = None
+        self.partials = []
+        self.partial_rows = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, chunk):
+        self._add_partial(len(chunk), aggregate_plt(chunk, *self.columns, engine=self.engine))
+
+    def add_arrays(self, arrays):
+        # a chunk as one array per column (array_fetch.ArrayChunk.arrays), aggregated without a DataFrame
+        period_col, event_col, loss_col, eventdate_col = self.columns
+        partial = None
+        if self.engine == 'numpy':
+            partial = numpy_aggregate_arrays(
+                arrays[period_col], arrays[event_col], arrays[loss_col], arrays[eventdate_col] if eventdate_col else None,
+                *self.columns,
+            )
+        if partial is None:
+            partial = aggregate_plt(pd.DataFrame(arrays), *self.columns, engine=self.engine)
+        self._add_partial(len(arrays[period_col]), partial)
+
+    def _add_partial(self, rows, partial):
+        self.rows += rows
+        self.partials.append(partial)
+        self.partial_rows += len(partial)
+
+        accumulated_rows = len(self.accumulated) if self.accumulated is not None else 0
+        if self.partial_rows >= max(self.compact_rows, accumulated_rows):
+            self._compact()
+
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0
+        logger.info(f"Aggregated {self.rows:,} PLT rows ({rate:,.0f} rows/s)")
+
+    def _compact(self):
+        if not self.partials:
+            return
+        frames = [self.accumulated] if self.accumulated is not None else []
+        frames.extend(self.partials)
+        # concat keeps earlier chunks first, so 'first' still picks the earliest non-null date
+        self.accumulated = aggregate_plt(pd.concat(frames, ignore_index=True), *self.columns, engine=self.engine)
+        self.partials = []
+        self.partial_rows = 0
+
+    def result(self):
+        self._compact()
+        if self.accumulated is None:
+            return pd.DataFrame()
+        ylt_df = self.accumulated
+        self.accumulated = None
+        return ylt_df
@@ -1,16 +1,46 @@
 import os
 import io
+import re
+import csv
 import logging
+import time
+import tracemalloc
+import atexit
+import hashlib
+import threading
+import tempfile
+import shutil
+import uuid
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import zipfile
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, Response
-import pandas as pd
-import numpy as np
-import sqlalchemy as sa
-from sqlalchemy import create_engine, text, URL
 from dotenv import load_dotenv
-from sqlalchemy.exc import ProgrammingError
+from lazy_import import lazy_module, lazy_callable, preload
+from result_cache import ResultCache, cache_key
+from catalog_cache import CatalogCache
+from admission import AdmissionController, AdmissionRejected, physical_memory
+from tracing import trace, stage, attached, traced_chunks, traced_stream, current_trace, registry
 import base64
+
+# the data stack is imported on first use, not at startup: the login page and the dashboard need none of it
+pd = lazy_module('pandas')
+np = lazy_module('numpy')
+sa = lazy_module('sqlalchemy')
+PLTAggregator = lazy_callable('aggregation', 'PLTAggregator')
+aggregate_plt = lazy_callable('aggregation', 'aggregate_plt')
+fetch_arrays = lazy_callable('array_fetch', 'fetch_arrays')
+ylt_metrics = lazy_callable('metrics', 'ylt_metrics')
+resolve_output_format = lazy_callable('output_formats', 'resolve_output_format')
+output_filename = lazy_callable('output_formats', 'output_filename')
+output_mimetype = lazy_callable('output_formats', 'output_mimetype')
+is_compressed = lazy_callable('output_formats', 'is_compressed')
+write_output = lazy_callable('output_formats', 'write_output')
+ifm_csv = lazy_callable('output_formats', 'ifm_csv')
+DATA_STACK = ('numpy', 'pandas', 'sqlalchemy', 'pymssql', 'aggregation', 'array_fetch', 'metrics', 'output_formats')
 load_dotenv()
 
 app = Flask(__name__)
@@ -20,6 +50,53 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Set to True if using HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour session timeout
+app.config['SQL_AGGREGATION'] = os.getenv('SQL_AGGREGATION', 'server')  # 'server' (GROUP BY in SQL Server) or 'pandas'
+app.config['AGGREGATION_ENGINE'] = os.getenv('AGGREGATION_ENGINE', 'numpy')  # 'numpy' (sort-based kernel) or 'pandas' (groupby)
+app.config['SQL_CHUNK_SIZE'] = int(os.getenv('SQL_CHUNK_SIZE', 250000))  # rows per read_sql_query chunk
+app.config['SQL_FETCH'] = os.getenv('SQL_FETCH', 'numpy')  # 'numpy' (cursor.fetchmany into NumPy arrays) or 'pandas' (read_sql_query chunks)
+app.config['SQL_FETCH_ARRAYSIZE'] = int(os.getenv('SQL_FETCH_ARRAYSIZE', 10000))  # rows per cursor.fetchmany call
+app.config['SQL_READ_PARALLELISM'] = int(os.getenv('SQL_READ_PARALLELISM', 1))  # connections reading PERIODID ranges of one conversion at once; 1 reads on a single cursor
+app.config['SQL_READ_PARALLELISM_BY_SERVER'] = os.getenv('SQL_READ_PARALLELISM_BY_SERVER', '')  # per-server overrides, e.g. 'GREAZUK1DB051P=4,DATABRIDGE=2'
+app.config['SQL_ORDER_BY_KEY'] = os.getenv('SQL_ORDER_BY_KEY', '0') == '1'  # pandas aggregation reads rdm_port ORDER BY period, event, so chunks arrive presorted (cheap when the clustered index has that order)
+app.config['CSV_STREAMING'] = os.getenv('CSV_STREAMING', '1') == '1'  # aggregate uploaded PLTs chunk by chunk
+app.config['CSV_CHUNK_SIZE'] = int(os.getenv('CSV_CHUNK_SIZE', 1000000))  # rows per uploaded CSV chunk
+app.config['ENGINE_CACHE_SIZE'] = int(os.getenv('ENGINE_CACHE_SIZE', 16))  # engines kept open across requests
+app.config['ENGINE_IDLE_TIMEOUT'] = int(os.getenv('ENGINE_IDLE_TIMEOUT', 1800))  # seconds before an unused engine is disposed
+app.config['BATCH_MAX_WORKERS'] = int(os.getenv('BATCH_MAX_WORKERS', 8))  # batch jobs running at once
+app.config['BATCH_PER_SERVER_CONCURRENCY'] = int(os.getenv('BATCH_PER_SERVER_CONCURRENCY', 2))  # batch jobs per SQL Server at once
+app.config['BATCH_JOB_DIR'] = os.getenv('BATCH_JOB_DIR', os.path.join(tempfile.gettempdir(), 'plt_ylt_batches'))  # finished batch zips
+app.config['BATCH_JOB_TTL'] = int(os.getenv('BATCH_JOB_TTL', 6 * 3600))  # seconds a finished batch stays downloadable
+app.config['RESULT_DIR'] = os.getenv('RESULT_DIR', os.path.join(tempfile.gettempdir(), 'plt_ylt_results'))  # converted YLTs waiting to be downloaded
+app.config['RESULT_TTL'] = int(os.getenv('RESULT_TTL', 1800))  # seconds a converted YLT stays downloadable
+app.config['RESULT_STORE_SIZE'] = int(os.getenv('RESULT_STORE_SIZE', 8))  # converted YLTs kept on disk for download at once
+app.config['DOWNLOAD_CHUNK_ROWS'] = int(os.getenv('DOWNLOAD_CHUNK_ROWS', 100000))  # rows per streamed CSV block
+app.config['ARROW_BATCH_ROWS'] = int(os.getenv('ARROW_BATCH_ROWS', 1000000))  # rows per Parquet row group / Arrow record batch
+app.config['OUTPUT_FORMAT'] = os.getenv('OUTPUT_FORMAT', 'csv')  # csv, csv.gz, csv.zst, parquet or arrow
+app.config['LEAP_YEAR_POLICY'] = os.getenv('LEAP_YEAR_POLICY', 'legacy')  # rate of leap-year dates: 'legacy' (day/365, Dec 31 gives 1.00274), 'actual' (day/366) or 'clip' (day/365 capped at 1.0)
+app.config['TRACE_TRACEMALLOC'] = os.getenv('TRACE_TRACEMALLOC', '0') == '1'  # Python-heap peaks per stage, slows conversions down
+app.config['RESULT_CACHE'] = os.getenv('RESULT_CACHE', '1') == '1'  # reuse converted YLTs while rdm_port is unchanged
+app.config['RESULT_CACHE_DIR'] = os.getenv('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'plt_ylt_cache'))
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.getenv('RESULT_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # LRU eviction above this size
+app.config['CATALOG_CACHE_TTL'] = int(os.getenv('CATALOG_CACHE_TTL', 300))  # seconds a database/ANLSID/PERSPCODE list is served without a refresh
+app.config['CATALOG_CACHE_MAX_AGE'] = int(os.getenv('CATALOG_CACHE_MAX_AGE', 24 * 3600))  # stale lists are served while refreshing in the background up to this age
+app.config['CATALOG_CACHE_SIZE'] = int(os.getenv('CATALOG_CACHE_SIZE', 1024))  # lists kept across servers, databases and logins
+app.config['RESULT_CACHE_FINGERPRINT'] = os.getenv('RESULT_CACHE_FINGERPRINT', 'stats')  # 'stats' (catalog row count/dates) or 'checksum' (CHECKSUM_AGG over the slice)
+app.config['ADMISSION_MEMORY_BUDGET'] = int(os.getenv('ADMISSION_MEMORY_BUDGET', (physical_memory() or 0) // 2))  # bytes running conversions may hold together, half the RAM by default; 0 admits everything
+app.config['ADMISSION_BYTES_PER_ROW'] = int(os.getenv('ADMISSION_BYTES_PER_ROW', 250))  # peak bytes per rdm_port row read by pandas aggregation (bench_end_to_end measures 185-250)
+app.config['ADMISSION_BYTES_PER_GROUP'] = int(os.getenv('ADMISSION_BYTES_PER_GROUP', 225))  # peak bytes per (period, event) row returned by SQL Server aggregation (bench_end_to_end measures ~225)
+app.config['ADMISSION_GROUPS_PER_ROW'] = float(os.getenv('ADMISSION_GROUPS_PER_ROW', 0.5))  # (period, event) groups per rdm_port row; 1.0 assumes no row shares a group
+app.config['ADMISSION_DEFAULT_BYTES'] = int(os.getenv('ADMISSION_DEFAULT_BYTES', 512 * 1024 * 1024))  # reserved when the rows cannot be narrowed to the requested ANLSIDs
+app.config['ADMISSION_BYTES_PER_UPLOAD_BYTE'] = float(os.getenv('ADMISSION_BYTES_PER_UPLOAD_BYTE', 6))  # peak bytes per byte of uploaded CSV read whole (CSV_STREAMING off; bench_end_to_end measures ~5.3)
+app.config['ADMISSION_UPLOAD_BYTES_PER_ROW'] = float(os.getenv('ADMISSION_UPLOAD_BYTES_PER_ROW', 40))  # bytes per PLT row in an uploaded CSV, to count rows from the upload size (bench_end_to_end writes ~42)
+app.config['ADMISSION_BYTES_PER_CHUNK_ROW'] = int(os.getenv('ADMISSION_BYTES_PER_CHUNK_ROW', 100))  # bytes per row of the CSV chunk being parsed when streaming
+app.config['ADMISSION_MAX_QUEUED'] = int(os.getenv('ADMISSION_MAX_QUEUED', 2))  # requests waiting for memory before new ones get 429; each holds a server thread
+app.config['ADMISSION_QUEUE_TIMEOUT'] = int(os.getenv('ADMISSION_QUEUE_TIMEOUT', 60))  # seconds a request waits for memory before it gets 503
+app.config['ADMISSION_RETRY_AFTER'] = int(os.getenv('ADMISSION_RETRY_AFTER', 30))  # Retry-After seconds sent with 429/503
+app.config['SERVER_HOST'] = os.getenv('SERVER_HOST', '127.0.0.1')  # waitress bind address; 0.0.0.0 serves the network
+app.config['SERVER_PORT'] = int(os.getenv('SERVER_PORT', 8100))
+app.config['SERVER_THREADS'] = int(os.getenv('SERVER_THREADS', 8))  # waitress worker threads, the requests handled at once
+app.config['SERVER_CHANNEL_TIMEOUT'] = int(os.getenv('SERVER_CHANNEL_TIMEOUT', 300))  # seconds an idle connection is kept open
+app.config['SERVER_CONNECTION_LIMIT'] = int(os.getenv('SERVER_CONNECTION_LIMIT', 100))  # open connections before waitress stops accepting
 
 DATABRIDGE = '103db9bcc5307a1d669c5f0946a36dfc.databridge.rms-pe.com'
 EDM_SERVERS = ('GREAZUK1DB051P', 'GREAZUK1DB101P', 'GREAZUK1DB181P', 'GREAZUK1DB201P', 'GREAZUK1DB251P', 'DATABRIDGE')
@@ -28,7 +105,97 @@ EDM_SERVERS = ('GREAZUK1DB051P', 'GREAZUK1DB101P', 'GREAZUK1DB181P', 'GREAZUK1DB
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def preload_data_stack():
+    # imports the data stack ahead of the first conversion; run.py calls it on a background thread once the server listens
+    started = time.perf_counter()
+    try:
+        preload(*DATA_STACK)
+    except ImportError as e:
+        logger.warning(f"Preloading the data stack stopped: {e}")
+        return
+    logger.info(f"Data stack loaded in {time.perf_counter() - started:.2f}s")
+
+result_cache = ResultCache(app.config['RESULT_CACHE_DIR'], app.config['RESULT_CACHE_MAX_BYTES'])
+catalog_cache = CatalogCache(app.config['CATALOG_CACHE_TTL'], app.config['CATALOG_CACHE_MAX_AGE'], app.config['CATALOG_CACHE_SIZE'])
+admission = AdmissionController(
+    app.config['ADMISSION_MEMORY_BUDGET'], app.config['ADMISSION_MAX_QUEUED'],
+    app.config['ADMISSION_QUEUE_TIMEOUT'], app.config['ADMISSION_RETRY_AFTER'],
+)
+
+if app.config['TRACE_TRACEMALLOC']:
+    tracemalloc.start()
+
+# process-wide engine registry: (server, database, username, domain, password digest) -> [engine, last_used]
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+def _engine_key(server, database, username, password, domain):
+    # the password digest keeps a stale or wrong password from reusing another login's pool
+    password_digest = hashlib.sha256((password or '').encode('utf-8')).hexdigest()
+    return (server, database, username, domain or None, password_digest)
+
+def _pop_expired_engines(now):
+    # caller holds _engines_lock
+    expired = []
+    idle_timeout = app.config['ENGINE_IDLE_TIMEOUT']
+    for key, (engine, last_used) in list(_engines.items()):
+        if now - last_used > idle_timeout:
+            expired.append((key, _engines.pop(key)[0]))
+    while len(_engines) > app.config['ENGINE_CACHE_SIZE']:
+        key, (engine, _) = _engines.popitem(last=False)
+        expired.append((key, engine))
+    return expired
+
+def _dispose_engines(engines):
+    for key, engine in engines:
+        logger.info(f"Disposing cached engine for {key[0]}/{key[1]}")
+        try:
+            engine.dispose()
+        except Exception as exc:
+            logger.warning(f"Failed to dispose engine for {key[0]}/{key[1]}: {exc}")
+
+def dispose_all_engines():
+    with _engines_lock:
+        engines = [(key, entry[0]) for key, entry in _engines.items()]
+        _engines.clear()
+    _dispose_engines(engines)
+
+atexit.register(dispose_all_engines)
+
 def get_engine(server: str, database: str, username: str, password: str, domain: str = None):
+    key = _engine_key(server, database, username, password, domain)
+    now = time.monotonic()
+
+    with _engines_lock:
+        expired = _pop_expired_engines(now)
+        entry = _engines.get(key)
+        if entry is not None:
+            entry[1] = now
+            _engines.move_to_end(key)
+    _dispose_engines(expired)
+
+    if entry is not None:
+        logger.info(f"Reusing cached engine for {server}/{database}")
+        return entry[0]
+
+    engine = create_sql_engine(server, database, username, password, domain)
+
+    with _engines_lock:
+        entry = _engines.get(key)
+        if entry is not None:
+            # another request created the same engine meanwhile, keep the first one
+            duplicate, engine = engine, entry[0]
+        else:
+            duplicate = None
+            _engines[key] = [engine, now]
+        expired = _pop_expired_engines(now)
+    if duplicate is not None:
+        duplicate.dispose()
+    _dispose_engines(expired)
+
+    return engine
+
+def create_sql_engine(server: str, database: str, username: str, password: str, domain: str = None):
     try:
         if server == 'DATABRIDGE':
             server = DATABRIDGE
@@ -47,7 +214,7 @@ def get_engine(server: str, database: str, username: str, password: str, domain:
                 logger.warning(f"Could not parse port from server string: {server}")
                 port = None
 
-        connection_url = URL.create(
+        connection_url = sa.URL.create(
             "mssql+pymssql",
             username=username,
             password=password,
@@ -74,7 +241,7 @@ def get_engine(server: str, database: str, username: str, password: str, domain:
         
         # test connection
         with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+            conn.execute(sa.text("SELECT 1"))
         
         logger.info(f"Successfully created engine for {server}/{database}")
         return engine
@@ -83,182 +250,796 @@ def get_engine(server: str, database: str, username: str, password: str, domain:
         logger.error(f"Failed to create engine: {exc}")
         raise
 
+PERIOD_PATTERNS = ['periodid', 'period_id', 'period']
+EVENT_PATTERNS = ['eventid', 'event_id', 'event']
+LOSS_PATTERNS = ['loss', 'losses']
+CSV_LOSS_PATTERNS = ['loss', 'losses', 'ground_up_loss']
+EVENTDATE_PATTERNS = ['eventdate', 'event_date']
+LEAP_YEAR_POLICIES = ('legacy', 'actual', 'clip')
+
+# schemas each RDM table is read from, in order of preference
+RDM_TABLE_SCHEMAS = {
+    'rdm_port': ['plt', 'dbo'],
+    'rdm_analysis': ['dbo', 'plt'],
+    'rdm_anlspersp': ['dbo', 'plt'],
+}
+DATABRIDGE_TABLE_SCHEMAS = {
+    'rdm_port': ['plt'],
+    'rdm_anlspersp': ['plt', 'dbo'],
+}
+
+# day of year and year length computed by SQL Server when aggregation is pushed down
+DAY_OF_YEAR_COL = '__dayofyear'
+DAYS_IN_YEAR_COL = '__daysinyear'
+
+
+def find_column(columns, patterns):
+    columns_lower = {col.lower(): col for col in columns}
+    for pattern in patterns:
+        if pattern in columns_lower:
+            return columns_lower[pattern]
+    return None
+
+def resolve_csv_columns(columns):
+    period_col = find_column(columns, PERIOD_PATTERNS)
+    event_col = find_column(columns, EVENT_PATTERNS)
+    loss_col = find_column(columns, CSV_LOSS_PATTERNS)
+
+    if not all([period_col, event_col, loss_col]):
+        # try positional 
+        if len(columns) >= 3:
+            period_col = columns[0]
+            event_col = columns[1]
+            loss_col = columns[2]
+            logger.warning(f"Using positional columns: {period_col}, {event_col}, {loss_col}")
+        else:
+            raise ValueError(f"Cannot identify required columns. Found columns: {list(columns)}")
+
+    logger.info(f"Using columns - Period: {period_col}, Event: {event_col}, Loss: {loss_col}")
+    return period_col, event_col, loss_col
+
+def build_csv_ifm(ylt_df, period_col, event_col, loss_col):
+    # YLT DataFrame in IFM format
+    ylt = pd.DataFrame()
+    ylt['intYear'] = ylt_df[period_col]
+    ylt['dblLoss'] = ylt_df[loss_col]
+    ylt['CAT'] = 'CAT'
+    ylt['zero'] = 0
+    ylt['rate'] = 1
+    ylt['intEvent'] = ylt_df[event_col]
+    
+    # drop empty rows (they used to surface as a ",,,,," line) without a CSV round trip
+    return ylt.dropna(subset=['intYear', 'dblLoss', 'intEvent'], how='all').reset_index(drop=True)
+
 def convert_csv_plt_to_ylt(df):
     try:
-    
-        df_columns_lower = {col.lower(): col for col in df.columns}
-        
-        period_col = None
-        event_col = None
-        loss_col = None
-        
-        #  period column
-        for pattern in ['periodid', 'period_id', 'period']:
-            if pattern in df_columns_lower:
-                period_col = df_columns_lower[pattern]
-                break
-        
-        #  event column
-        for pattern in ['eventid', 'event_id', 'event']:
-            if pattern in df_columns_lower:
-                event_col = df_columns_lower[pattern]
-                break
-        
-        #  loss column
-        for pattern in ['loss', 'losses', 'ground_up_loss']:
-            if pattern in df_columns_lower:
-                loss_col = df_columns_lower[pattern]
-                break
-        
-        if not all([period_col, event_col, loss_col]):
-            # try positional 
-            if len(df.columns) >= 3:
-                period_col = df.columns[0]
-                event_col = df.columns[1]
-                loss_col = df.columns[2]
-                logger.warning(f"Using positional columns: {period_col}, {event_col}, {loss_col}")
-            else:
-                raise ValueError(f"Cannot identify required columns. Found columns: {df.columns.tolist()}")
-        
-        logger.info(f"Using columns - Period: {period_col}, Event: {event_col}, Loss: {loss_col}")
+        period_col, event_col, loss_col = resolve_csv_columns(df.columns.tolist())
         
         # Add aggregation
         logger.info(f"Aggregating {len(df)} PLT rows into a YLT structure...")
         
-        # aggregation rules
-        agg_rules = {loss_col: 'sum'}  # sum up all losses for the same event in the same year
-        
-        # group by periodid and eventid + apply the aggregation
-        ylt_df = df.groupby([period_col, event_col]).agg(agg_rules).reset_index()
+        # sum up all losses for the same event in the same year
+        with stage('aggregate') as counter:
+            ylt_df = aggregate_plt(df, period_col, event_col, loss_col, engine=app.config['AGGREGATION_ENGINE'])
+            counter['rows'] = len(df)
         
         logger.info(f"Aggregation complete. Resulting YLT has {len(ylt_df)} rows.")
         
-        # YLT DataFrame in IFM format
-        ylt = pd.DataFrame()
-        ylt['intYear'] = ylt_df[period_col]
-        ylt['dblLoss'] = ylt_df[loss_col]
-        ylt['CAT'] = 'CAT'
-        ylt['zero'] = 0
-        ylt['rate'] = 1
-        ylt['intEvent'] = ylt_df[event_col]
-        
-        #  to string, remove trailing comma
-        output = io.StringIO()
-        ylt.to_csv(output, index=False, header=False)
-        csv_string = output.getvalue()
-        lines = csv_string.splitlines()
-        if len(lines) > 0 and lines[0] == ",,,,,":
-            lines[0] = ""
-        
-        # clean string
-        return pd.read_csv(io.StringIO("\n".join(lines)), header=None, names=ylt.columns)
+        with stage('build YLT'):
+            return build_csv_ifm(ylt_df, period_col, event_col, loss_col)
     
     except Exception as e:
         logger.error(f"Error converting CSV PLT to YLT: {e}")
         raise
 
-def convert_sql_plt_to_ylt(engine, database, server, anlsid=None, perspcode=None):
+def read_csv_header(stream):
+    # sniff the header once, then rewind so pandas reads the file from the start
+    first_line = stream.readline()
+    stream.seek(0)
+    if isinstance(first_line, bytes):
+        first_line = first_line.decode('utf-8-sig', errors='replace')
+    return next(csv.reader([first_line]), [])
 
-    schemas_to_try = ['plt', 'dbo']
-    df = None
-    successful_query = None
-    
-    for schema in schemas_to_try:
+def convert_csv_stream_to_ylt(stream, chunksize=None):
+    # out-of-core variant of convert_csv_plt_to_ylt: reads only the PLT columns in bounded chunks
+    chunksize = chunksize or app.config['CSV_CHUNK_SIZE']
+    try:
+        header = read_csv_header(stream)
+        period_col, event_col, loss_col = resolve_csv_columns(header)
+
+        dtypes = {period_col: 'int64', event_col: 'int64', loss_col: 'float64'}
         try:
-            if server == 'DATABRIDGE':
-                query = f"SELECT * FROM [{database}].[plt].[rdm_port]"
-            else:
-                query = f"SELECT * FROM [{database}].[{schema}].[rdm_port]"
-
-            conditions = []
-            
-            if anlsid and str(anlsid).strip():
-                conditions.append(f"ANLSID = {anlsid}")
-            
-            if perspcode and perspcode.strip():
-                conditions.append(f"PERSPCODE = '{perspcode}'")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            logger.info(f"Attempting to execute query with schema '{schema}': {query}")
-            
-            chunks = []
-            for chunk in pd.read_sql_query(text(query), engine, chunksize=250000):
-                chunks.append(chunk)
-            
-            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
-            
-            successful_query = query
-            logger.info(f"Successfully executed query using schema '{schema}'.")
-            break 
-
-        except ProgrammingError as e:
-
-            if 'invalid object name' in str(e).lower():
-                logger.warning(f"Table not found in schema '{schema}'. Trying next schema...")
-                continue 
+            aggregator = aggregate_csv_chunks(stream, period_col, event_col, loss_col, dtypes, chunksize)
+        except ValueError as e:
+            # keys that are not plain integers (blanks, decimals): let pandas infer them
+            logger.warning(f"Integer read of the key columns failed ({e}), retrying with inferred dtypes")
+            stream.seek(0)
+            aggregator = aggregate_csv_chunks(stream, period_col, event_col, loss_col, {loss_col: 'float64'}, chunksize)
+
+        with stage('aggregate'):
+            ylt_df = aggregator.result()
+        if ylt_df.empty:
+            raise ValueError("The uploaded CSV contains no PLT rows.")
+
+        logger.info(f"Aggregation complete. {aggregator.rows} PLT rows became a YLT with {len(ylt_df)} rows.")
+
+        with stage('build YLT'):
+            return build_csv_ifm(ylt_df, period_col, event_col, loss_col)
+
+    except Exception as e:
+        logger.error(f"Error converting CSV PLT to YLT: {e}")
+        raise
+
+def aggregate_csv_chunks(stream, period_col, event_col, loss_col, dtypes, chunksize):
+    aggregator = PLTAggregator(period_col, event_col, loss_col, engine=app.config['AGGREGATION_ENGINE'])
+    reader = pd.read_csv(stream, usecols=[period_col, event_col, loss_col], dtype=dtypes, chunksize=chunksize)
+    for chunk in traced_chunks(reader, 'parse CSV'):
+        with stage('aggregate') as counter:
+            aggregator.add(chunk)
+            counter['rows'] = len(chunk)
+        del chunk
+    return aggregator
+
+def quote_name(engine, name):
+    # [name] on SQL Server, "name" on the other dialects
+    return engine.dialect.identifier_preparer.quote_identifier(name)
+
+def rdm_port_table(engine, database, schema):
+    # three-part name on SQL Server; other dialects (the benchmark's SQLite stand-in) only have schema.table
+    if engine.dialect.name == 'mssql':
+        return f"{quote_name(engine, database)}.{quote_name(engine, schema)}.{quote_name(engine, 'rdm_port')}"
+    return f"{quote_name(engine, schema)}.{quote_name(engine, 'rdm_port')}"
+
+def load_rdm_schemas(engine, database):
+    # table name (lower case) -> schemas holding it, for the RDM tables the app reads
+    tables = {table.lower() for table in RDM_TABLE_SCHEMAS}
+    found = {}
+    if engine.dialect.name == 'mssql':
+        query = sa.text(
+            f"SELECT t.name, s.name FROM [{database}].sys.tables t "
+            f"JOIN [{database}].sys.schemas s ON s.schema_id = t.schema_id "
+            f"WHERE t.name IN ('rdm_port', 'rdm_analysis', 'rdm_anlspersp')"
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+    else:
+        inspector = sa.inspect(engine)
+        rows = [(table, schema) for schema in inspector.get_schema_names() for table in inspector.get_table_names(schema=schema)]
+
+    for table, schema in rows:
+        if table.lower() in tables:
+            found.setdefault(table.lower(), []).append(schema)
+    logger.info(f"RDM tables in {database}: {found}")
+    # nothing visible is not cached: the login may lack rights, or the tables may not be created yet
+    return found or None
+
+def rdm_table_schema(engine, server, database, table):
+    # schema of an RDM table, looked up once per login and database and kept in the catalog cache, since
+    # sys.tables only lists the tables the login has rights on; None when the table is in none of the
+    # schemas the app reads it from
+    url = engine.url
+    key = catalog_key('schemas', server, database, url.username, url.password, None)
+    schemas = catalog_cache.get(key, lambda: load_rdm_schemas(engine, database)) or {}
+    found = {schema.lower(): schema for schema in schemas.get(table, [])}
+    for schema in rdm_schema_preference(server, table):
+        if schema in found:
+            return found[schema]
+    return None
+
+def rdm_schema_preference(server, table):
+    if server == 'DATABRIDGE':
+        return DATABRIDGE_TABLE_SCHEMAS.get(table, RDM_TABLE_SCHEMAS[table])
+    return RDM_TABLE_SCHEMAS[table]
+
+def rdm_port_catalog_rows(engine, database, schema):
+    # (column, data type, 'YES'/'NO' nullable) of rdm_port in the schema
+    if engine.dialect.name == 'mssql':
+        query = sa.text(
+            f"SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE FROM [{database}].INFORMATION_SCHEMA.COLUMNS "
+            f"WHERE TABLE_NAME = 'rdm_port' AND TABLE_SCHEMA = :schema ORDER BY ORDINAL_POSITION"
+        )
+        with engine.connect() as conn:
+            return conn.execute(query, {'schema': schema}).fetchall()
+
+    return [
+        (column['name'], str(column['type']).split('(')[0], 'YES' if column['nullable'] else 'NO')
+        for column in sa.inspect(engine).get_columns('rdm_port', schema=schema)
+    ]
+
+def resolve_rdm_port_columns(engine, database, server):
+    schema = rdm_table_schema(engine, server, database, 'rdm_port')
+    if schema is None:
+        raise ValueError(f"Could not find the 'rdm_port' table in any of the attempted schemas: {rdm_schema_preference(server, 'rdm_port')}")
+
+    columns = {}
+    nullable = set()
+    for column, data_type, is_nullable in rdm_port_catalog_rows(engine, database, schema):
+        columns[column] = data_type.lower()
+        if is_nullable == 'YES':
+            nullable.add(column)
+
+    resolved = {
+        'schema': schema,
+        'period': find_column(columns, PERIOD_PATTERNS),
+        'event': find_column(columns, EVENT_PATTERNS),
+        'loss': find_column(columns, LOSS_PATTERNS),
+        'eventdate': find_column(columns, EVENTDATE_PATTERNS),
+        'types': columns,
+        'nullable': nullable,
+    }
+    logger.info(f"Resolved rdm_port in schema '{schema}': period={resolved['period']}, event={resolved['event']}, loss={resolved['loss']}, eventdate={resolved['eventdate']}")
+    return resolved
+
+def filter_values(value):
+    # one value, a list of values, or None/'' for no filter -> list of stripped strings
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [str(item).strip() for item in values if item is not None and str(item).strip()]
+
+def anlsid_values(anlsid):
+    values = filter_values(anlsid)
+    for value in values:
+        if not value.lstrip('-').isdigit():
+            raise ValueError(f"ANLSID must be an integer, got '{value}'")
+    return [int(value) for value in values]
+
+def bind_condition(column, values, params):
+    # "column = :p" or "column IN (:p, :q)"; the values go into params under fresh names
+    names = []
+    for value in values:
+        name = f"{column.lower()}_{len(params)}"
+        params[name] = value
+        names.append(f":{name}")
+    return f"{column} = {names[0]}" if len(names) == 1 else f"{column} IN ({', '.join(names)})"
+
+def period_conditions(period_range, params):
+    # period_range is (quoted period column, first period, end period) with None for an open end
+    if period_range is None:
+        return []
+    column, start, end = period_range
+    conditions = []
+    if start is not None:
+        params['period_start'] = start
+        conditions.append(f"{column} >= :period_start")
+    if end is not None:
+        params['period_end'] = end
+        conditions.append(f"{column} < :period_end")
+    return conditions
+
+def build_rdm_port_where(anlsid=None, perspcode=None, period_range=None):
+    # WHERE clause with bound parameters; anlsid and perspcode may each be one value or a list
+    conditions = []
+    params = {}
+
+    anlsids = anlsid_values(anlsid)
+    if anlsids:
+        conditions.append(bind_condition('ANLSID', anlsids, params))
+
+    perspcodes = filter_values(perspcode)
+    if perspcodes:
+        conditions.append(bind_condition('PERSPCODE', perspcodes, params))
+
+    conditions.extend(period_conditions(period_range, params))
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+def key_not_null_where(engine, columns, where):
+    # SQL Server's GROUP BY keeps NULL periods and events as groups of their own, while the pandas
+    # aggregation drops them; leaving those rows out keeps both paths' YLTs identical
+    conditions = [f"{quote_name(engine, columns[key])} IS NOT NULL" for key in ('period', 'event') if columns[key] in columns['nullable']]
+    if not conditions:
+        return where
+    if not where:
+        return " WHERE " + " AND ".join(conditions)
+    return f" WHERE ({where[len(' WHERE '):]}) AND " + " AND ".join(conditions)
+
+def sql_parameter_type(columns, name):
+    # T-SQL type declared for a bound ANLSID/PERSPCODE value, matching the column's own type family
+    # so the comparison needs no implicit conversion of the column
+    if name.startswith('period'):
+        return 'bigint' if columns['types'].get(columns['period']) == 'bigint' else 'int'
+    column = 'ANLSID' if name.startswith('anlsid') else 'PERSPCODE'
+    data_type = next((data_type for col, data_type in columns['types'].items() if col.upper() == column), None)
+    if column == 'ANLSID':
+        return data_type if data_type in ('tinyint', 'smallint', 'int', 'bigint') else 'int'
+    return 'varchar(8000)' if data_type in ('varchar', 'char') else 'nvarchar(4000)'
+
+def rdm_port_statement(engine, query, params, columns):
+    # pymssql inlines bound values into the SQL text, so every ANLSID/PERSPCODE would still be a new
+    # ad-hoc plan; on SQL Server the query runs through sp_executesql with typed parameters instead,
+    # and every value reuses one cached plan. The query text only holds identifiers and :name markers.
+    if engine.dialect.name != 'mssql' or not params:
+        return sa.text(query), params
+    statement = re.sub(r':(\w+)', r'@\1', query).replace("'", "''")
+    declarations = ', '.join(f"@{name} {sql_parameter_type(columns, name)}" for name in params)
+    assignments = ', '.join(f"@{name} = :{name}" for name in params)
+    return sa.text(f"EXEC sp_executesql N'{statement}', N'{declarations}', {assignments}"), params
+
+def rdm_port_dtypes(columns):
+    # compact dtypes for the projected PLT columns; nullable keys keep pandas' own inference
+    dtypes = {}
+    for key in ('period', 'event'):
+        col = columns[key]
+        if col not in columns['nullable']:
+            dtypes[col] = 'int64' if columns['types'].get(col) == 'bigint' else 'int32'
+    dtypes[columns['loss']] = 'float64'
+    return dtypes
+
+def read_rdm_port_chunks(engine, query, params, columns, chunksize=None):
+    chunksize = chunksize or app.config['SQL_CHUNK_SIZE']
+    parse_dates = [columns['eventdate']] if columns['eventdate'] else None
+    statement, params = rdm_port_statement(engine, query, params, columns)
+    return pd.read_sql_query(statement, engine, params=params, chunksize=chunksize, dtype=rdm_port_dtypes(columns), parse_dates=parse_dates)
+
+def rdm_port_array_fields(columns):
+    # (column, dtype) of the projection for fetch_arrays; None when a nullable key column needs pandas' inference
+    dtypes = rdm_port_dtypes(columns)
+    if columns['period'] not in dtypes or columns['event'] not in dtypes:
+        return None
+    fields = [(columns[key], dtypes[columns[key]]) for key in ('period', 'event', 'loss')]
+    if columns['eventdate']:
+        fields.append((columns['eventdate'], 'datetime'))
+    return fields
+
+def read_rdm_port_arrays(engine, query, params, columns, fields, chunksize=None):
+    # rows straight off the DBAPI cursor into NumPy arrays, without SQLAlchemy rows or a DataFrame per chunk
+    chunksize = chunksize or app.config['SQL_CHUNK_SIZE']
+    statement, params = rdm_port_statement(engine, query, params, columns)
+    with engine.connect() as conn:
+        result = conn.execute(statement, params)
+        yield from fetch_arrays(result.cursor, fields, chunksize, app.config['SQL_FETCH_ARRAYSIZE'])
+
+def eventdate_select(engine, eventdate_col):
+    # SQL Server hands back the day of year of the earliest date and that year's length, so no dates
+    # are fetched or converted; other dialects return the date itself
+    eventdate = quote_name(engine, eventdate_col)
+    if engine.dialect.name == 'mssql':
+        return [
+            f"DATEPART(dayofyear, MIN({eventdate})) AS {quote_name(engine, DAY_OF_YEAR_COL)}",
+            f"DATEPART(dayofyear, DATEFROMPARTS(YEAR(MIN({eventdate})), 12, 31)) AS {quote_name(engine, DAYS_IN_YEAR_COL)}",
+        ]
+    return [f"MIN({eventdate}) AS {eventdate}"]
+
+def aggregate_rdm_port_on_server(engine, database, columns, anlsid=None, perspcode=None, progress=None, period_range=None):
+    period_col, event_col, loss_col, eventdate_col = columns['period'], columns['event'], columns['loss'], columns['eventdate']
+
+    period, event, loss = quote_name(engine, period_col), quote_name(engine, event_col), quote_name(engine, loss_col)
+    select_list = [period, event, f"SUM({loss}) AS {loss}"]
+    if eventdate_col:
+        select_list.extend(eventdate_select(engine, eventdate_col))
+
+    where, params = build_rdm_port_where(anlsid, perspcode, period_range)
+    where = key_not_null_where(engine, columns, where)
+    query = f"SELECT {', '.join(select_list)} FROM {rdm_port_table(engine, database, columns['schema'])}{where}"
+    query += f" GROUP BY {period}, {event} ORDER BY {period}, {event}"
+
+    logger.info(f"Executing server-side aggregation: {query} {params}")
+    report_progress(progress, 'aggregating on server')
+
+    chunks = []
+    rows = 0
+    for chunk in traced_chunks(read_rdm_port_chunks(engine, query, params, columns), 'fetch'):
+        chunks.append(chunk)
+        rows += len(chunk)
+        report_progress(progress, 'fetching aggregated rows', rows)
+
+    with stage('concat'):
+        ylt_df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=[period_col, event_col, loss_col])
+    return ylt_df, query
+
+def aggregate_rdm_port_in_pandas(engine, database, columns, anlsid=None, perspcode=None, chunksize=None, progress=None, period_range=None):
+    period_col, event_col, loss_col, eventdate_col = columns['period'], columns['event'], columns['loss'], columns['eventdate']
+
+    # fetch only the columns the YLT needs
+    projection = [col for col in (period_col, event_col, loss_col, eventdate_col) if col]
+    where, params = build_rdm_port_where(anlsid, perspcode, period_range)
+    query = f"SELECT {', '.join(quote_name(engine, col) for col in projection)} FROM {rdm_port_table(engine, database, columns['schema'])}{where}"
+    if app.config['SQL_ORDER_BY_KEY']:
+        # presorted chunks skip the aggregator's sort
+        query += f" ORDER BY {quote_name(engine, period_col)}, {quote_name(engine, event_col)}"
+
+    logger.info(f"Executing query with schema '{columns['schema']}': {query} {params}")
+    report_progress(progress, 'fetching')
+
+    # sum up all losses for the same event in the same year, chunk by chunk
+    aggregator = PLTAggregator(period_col, event_col, loss_col, eventdate_col, engine=app.config['AGGREGATION_ENGINE'])
+    fields = rdm_port_array_fields(columns) if app.config['SQL_FETCH'] == 'numpy' else None
+    if fields:
+        chunks = read_rdm_port_arrays(engine, query, params, columns, fields, chunksize)
+    else:
+        chunks = read_rdm_port_chunks(engine, query, params, columns, chunksize)
+    for chunk in traced_chunks(chunks, 'fetch'):
+        with stage('aggregate') as counter:
+            if fields:
+                aggregator.add_arrays(chunk.arrays)
             else:
-                logger.error(f"An unexpected SQL error occurred with schema '{schema}': {e}")
-                raise
-        except Exception as e:
-            logger.error(f"A non-SQL error occurred while querying schema '{schema}': {e}")
-            raise
-            
-    if df is None:
-        raise ValueError(f"Could not find the 'rdm_port' table in any of the attempted schemas: {schemas_to_try}")
+                aggregator.add(chunk)
+            counter['rows'] = len(chunk)
+        del chunk
+        report_progress(progress, 'fetching', aggregator.rows)
 
-    
-    if df.empty:
-        raise ValueError(f"Query returned no data. Check your parameters (ANLSID, PERSPCODE) and table contents. Query: {successful_query}")
-    
-    logger.info(f"Retrieved {len(df)} rows from database")
-    logger.info(f"Columns found: {df.columns.tolist()}")
-    
-    ylt = pd.DataFrame()
-    
-    # Map columns 
-    df_columns_lower = {col.lower(): col for col in df.columns}
-    
-    # Find required columns
-    period_col, event_col, loss_col, eventdate_col = None, None, None, None
-    
-    for pattern in ['periodid', 'period_id', 'period']:
-        if pattern in df_columns_lower:
-            period_col = df_columns_lower[pattern]
-            break
-    
-    for pattern in ['eventid', 'event_id', 'event']:
-        if pattern in df_columns_lower:
-            event_col = df_columns_lower[pattern]
-            break
-    
-    for pattern in ['loss', 'losses']:
-        if pattern in df_columns_lower:
-            loss_col = df_columns_lower[pattern]
-            break
-            
-    for pattern in ['eventdate', 'event_date', ]:
-        if pattern in df_columns_lower:
-            eventdate_col = df_columns_lower[pattern]
-            break
-    
-    if not all([period_col, event_col, loss_col]):
-        logger.error(f"Required columns not found. Available columns: {df.columns.tolist()}")
+    logger.info(f"Retrieved and aggregated {aggregator.rows} rows from database")
+    with stage('aggregate'):
+        return aggregator.result(), query
+
+def build_rdm_port_partition_where(partitions, period_range=None):
+    # partitions maps ANLSID -> list of PERSPCODEs, or None for every PERSPCODE of that ANLSID
+    params = {}
+    whole = [anlsid for anlsid, perspcodes in partitions.items() if perspcodes is None]
+    conditions = [bind_condition('ANLSID', anlsid_values(whole), params)] if whole else []
+    for anlsid, perspcodes in partitions.items():
+        if perspcodes:
+            conditions.append(f"({bind_condition('ANLSID', anlsid_values(anlsid), params)} AND {bind_condition('PERSPCODE', perspcodes, params)})")
+    ranges = period_conditions(period_range, params)
+    if ranges:
+        return " WHERE (" + " OR ".join(conditions) + ") AND " + " AND ".join(ranges), params
+    return " WHERE " + " OR ".join(conditions), params
+
+def split_partitions(ylt_df):
+    # (ANLSID, PERSPCODE) -> rows of that partition, keys normalised the way the batch jobs name them
+    return {
+        (str(anlsid), str(perspcode).strip()): part.drop(columns=['ANLSID', 'PERSPCODE']).reset_index(drop=True)
+        for (anlsid, perspcode), part in ylt_df.groupby(['ANLSID', 'PERSPCODE'], sort=False)
+    }
+
+def aggregate_rdm_port_partitions_on_server(engine, database, columns, partitions, progress=None, period_range=None):
+    period_col, event_col, loss_col, eventdate_col = columns['period'], columns['event'], columns['loss'], columns['eventdate']
+
+    group_by = ', '.join(quote_name(engine, col) for col in ('ANLSID', 'PERSPCODE', period_col, event_col))
+    loss = quote_name(engine, loss_col)
+    select_list = [group_by, f"SUM({loss}) AS {loss}"]
+    if eventdate_col:
+        select_list.extend(eventdate_select(engine, eventdate_col))
+
+    where, params = build_rdm_port_partition_where(partitions, period_range)
+    where = key_not_null_where(engine, columns, where)
+    query = f"SELECT {', '.join(select_list)} FROM {rdm_port_table(engine, database, columns['schema'])}{where}"
+    query += f" GROUP BY {group_by} ORDER BY {group_by}"
+
+    logger.info(f"Executing server-side partitioned aggregation: {query} {params}")
+    report_progress(progress, 'aggregating on server')
+
+    chunks = []
+    rows = 0
+    for chunk in traced_chunks(read_rdm_port_chunks(engine, query, params, columns), 'fetch'):
+        chunks.append(chunk)
+        rows += len(chunk)
+        report_progress(progress, 'fetching aggregated rows', rows)
+
+    if not chunks:
+        return {}, query
+    with stage('concat'):
+        return split_partitions(pd.concat(chunks, ignore_index=True)), query
+
+def aggregate_rdm_port_partitions_in_pandas(engine, database, columns, partitions, chunksize=None, progress=None, period_range=None):
+    period_col, event_col, loss_col, eventdate_col = columns['period'], columns['event'], columns['loss'], columns['eventdate']
+
+    projection = ['ANLSID', 'PERSPCODE'] + [col for col in (period_col, event_col, loss_col, eventdate_col) if col]
+    where, params = build_rdm_port_partition_where(partitions, period_range)
+    query = f"SELECT {', '.join(quote_name(engine, col) for col in projection)} FROM {rdm_port_table(engine, database, columns['schema'])}{where}"
+    if app.config['SQL_ORDER_BY_KEY']:
+        query += " ORDER BY " + ', '.join(quote_name(engine, col) for col in ('ANLSID', 'PERSPCODE', period_col, event_col))
+
+    logger.info(f"Executing partitioned query with schema '{columns['schema']}': {query} {params}")
+    report_progress(progress, 'fetching')
+
+    # one running aggregate per (ANLSID, PERSPCODE), fed from the same scan
+    aggregators = {}
+    rows = 0
+    for chunk in traced_chunks(read_rdm_port_chunks(engine, query, params, columns, chunksize), 'fetch'):
+        rows += len(chunk)
+        with stage('aggregate') as counter:
+            for key, part in chunk.groupby(['ANLSID', 'PERSPCODE'], sort=False):
+                if key not in aggregators:
+                    aggregators[key] = PLTAggregator(period_col, event_col, loss_col, eventdate_col, engine=app.config['AGGREGATION_ENGINE'])
+                aggregators[key].add(part)
+            counter['rows'] = len(chunk)
+        del chunk
+        report_progress(progress, 'fetching', rows)
+
+    logger.info(f"Retrieved and aggregated {rows} rows into {len(aggregators)} partitions")
+    with stage('aggregate'):
+        return {
+            (str(anlsid), str(perspcode).strip()): aggregators[(anlsid, perspcode)].result()
+            for anlsid, perspcode in sorted(aggregators)
+        }, query
+
+def read_parallelism(server):
+    for item in app.config['SQL_READ_PARALLELISM_BY_SERVER'].split(','):
+        name, _, value = item.partition('=')
+        if name.strip() == server and value.strip().isdigit():
+            return max(1, int(value))
+    return max(1, app.config['SQL_READ_PARALLELISM'])
+
+def rdm_port_histogram(engine, database, schema, column):
+    # (upper key, range rows, equal rows, distinct range values) steps of the statistics histogram on an
+    # integer column of rdm_port, without touching the table; None when SQL Server has no such statistics
+    # or the DMF is not available (before 2016 SP1 CU2)
+    query = sa.text(
+        f"SELECT s.stats_id, CAST(h.range_high_key AS bigint), h.range_rows, h.equal_rows, h.distinct_range_rows "
+        f"FROM [{database}].sys.stats s "
+        f"JOIN [{database}].sys.stats_columns sc ON sc.object_id = s.object_id AND sc.stats_id = s.stats_id AND sc.stats_column_id = 1 "
+        f"JOIN [{database}].sys.columns c ON c.object_id = sc.object_id AND c.column_id = sc.column_id "
+        f"CROSS APPLY sys.dm_db_stats_histogram(s.object_id, s.stats_id) h "
+        f"WHERE s.object_id = OBJECT_ID(:table) AND c.name = :column"
+    )
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(query, {'table': rdm_port_table(engine, database, schema), 'column': column}).fetchall()
+    except sa.exc.DBAPIError as e:
+        logger.warning(f"Histogram on {column} not available: {e}")
+        return None
+
+    histograms = {}
+    for stats_id, key, range_rows, equal_rows, distinct_range_rows in rows:
+        if key is not None:
+            histograms.setdefault(stats_id, []).append((int(key), float(range_rows or 0), float(equal_rows or 0), float(distinct_range_rows or 0)))
+    if not histograms:
+        return None
+    # several statistics can lead with the column; the one that saw most rows is the freshest
+    return sorted(max(histograms.values(), key=lambda steps: sum(step[1] + step[2] for step in steps)))
+
+def histogram_rows(steps, value):
+    # estimated rows holding value; None above the last step, where rows added since the statistics were
+    # built (new, ascending ANLSIDs) are not counted
+    for key, range_rows, equal_rows, distinct_range_rows in steps:
+        if value == key:
+            return equal_rows
+        if value < key:
+            return range_rows / max(distinct_range_rows, 1)
+    return None
+
+def rdm_port_row_estimate(engine, database, schema, anlsid=None):
+    # (table rows, rows of the requested ANLSIDs) from catalog row counts instead of a COUNT(*); the ANLSID
+    # statistics histogram narrows the table's rows. Either is None when unknown.
+    if engine.dialect.name != 'mssql':
+        return None, None
+    query = sa.text(
+        f"SELECT SUM(row_count) FROM [{database}].sys.dm_db_partition_stats "
+        f"WHERE object_id = OBJECT_ID(:table) AND index_id IN (0, 1)"
+    )
+    try:
+        with engine.connect() as conn:
+            total = conn.execute(query, {'table': rdm_port_table(engine, database, schema)}).scalar()
+    except sa.exc.DBAPIError as e:
+        logger.warning(f"Row count of rdm_port not available for admission: {e}")
+        return None, None
+    if total is None:
+        return None, None
+
+    anlsids = anlsid_values(anlsid)
+    if not anlsids:
+        return int(total), int(total)
+    steps = rdm_port_histogram(engine, database, schema, 'ANLSID')
+    if steps:
+        rows = [histogram_rows(steps, value) for value in anlsids]
+        if None not in rows:
+            return int(total), min(int(total), int(sum(rows)))
+    return int(total), None
+
+def sql_memory_estimate(engine, database, columns, anlsid=None, aggregation='server'):
+    # bytes to reserve for a SQL conversion. SQL Server aggregation leaves only the GROUP BY output in
+    # the process; pandas aggregation holds the fetched rows' chunks and partial sums.
+    with stage('estimate memory'):
+        total, rows = rdm_port_row_estimate(engine, database, columns['schema'], anlsid)
+    if aggregation == 'server':
+        per_row = app.config['ADMISSION_BYTES_PER_GROUP'] * app.config['ADMISSION_GROUPS_PER_ROW']
+    else:
+        per_row = app.config['ADMISSION_BYTES_PER_ROW']
+    if rows is not None:
+        return int(rows * per_row)
+    # the whole table would reserve far too much for one ANLSID; a small table still bounds the default
+    default = app.config['ADMISSION_DEFAULT_BYTES']
+    return min(default, int(total * per_row)) if total is not None else default
+
+@contextmanager
+def admitted_sql_conversion(engine, database, columns, anlsid, aggregation, admit, progress=None):
+    # admit=None skips admission control (benchmarks, library use), False queues for at most
+    # ADMISSION_QUEUE_TIMEOUT (requests), True waits as long as it takes (background batches)
+    if admit is None:
+        yield
+        return
+    estimate = sql_memory_estimate(engine, database, columns, anlsid, aggregation)
+    report_progress(progress, 'waiting for memory')
+    with admission.admit(estimate, block=admit):
+        yield
+
+def upload_memory_estimate(content_length, streaming=None):
+    # bytes to reserve for an uploaded CSV. Read whole, the upload's frame is held next to the YLT; streamed,
+    # only one parsed chunk is, next to the partial sums of the (period, event) groups seen so far
+    content_length = content_length or 0
+    whole = int(content_length * app.config['ADMISSION_BYTES_PER_UPLOAD_BYTE'])
+    if not (app.config['CSV_STREAMING'] if streaming is None else streaming):
+        return whole
+    rows = content_length / app.config['ADMISSION_UPLOAD_BYTES_PER_ROW']
+    groups = rows * app.config['ADMISSION_GROUPS_PER_ROW'] * app.config['ADMISSION_BYTES_PER_GROUP']
+    chunk = min(rows, app.config['CSV_CHUNK_SIZE']) * app.config['ADMISSION_BYTES_PER_CHUNK_ROW']
+    return min(whole, int(groups + chunk))
+
+def admission_response(rejected):
+    response = jsonify({'error': str(rejected), 'retry_after': rejected.retry_after})
+    return response, rejected.status, {'Retry-After': str(rejected.retry_after)}
+
+def rdm_port_period_bounds(engine, database, columns, where, params):
+    period = quote_name(engine, columns['period'])
+    query = f"SELECT MIN({period}), MAX({period}) FROM {rdm_port_table(engine, database, columns['schema'])}{where}"
+    statement, params = rdm_port_statement(engine, query, params, columns)
+    with engine.connect() as conn:
+        return conn.execute(statement, params).fetchone()
+
+def rdm_port_period_ranges(engine, server, database, columns, where, params):
+    # splits the period domain into read_parallelism(server) ranges; [None] means one unsplit read.
+    # Groups are (period, event), so no group straddles two ranges.
+    parallelism = read_parallelism(server)
+    if parallelism <= 1 or columns['period'] in columns['nullable']:
+        return [None]
+
+    cuts = []
+    steps = rdm_port_histogram(engine, database, columns['schema'], columns['period']) if engine.dialect.name == 'mssql' else None
+    if steps:
+        # equal row counts per range, going by the histogram of the whole table
+        total = sum(range_rows + equal_rows for _, range_rows, equal_rows, _ in steps)
+        running = 0.0
+        targets = [total * part / parallelism for part in range(1, parallelism)]
+        for key, range_rows, equal_rows, _ in steps:
+            running += range_rows + equal_rows
+            while targets and running >= targets[0]:
+                targets.pop(0)
+                cuts.append(key + 1)
+    else:
+        low, high = rdm_port_period_bounds(engine, database, columns, where, params)
+        if low is None:
+            return [None]
+        # equal period spans between the filtered MIN and MAX
+        low, high = int(low), int(high)
+        width = (high - low + 1) / parallelism
+        cuts = [low + round(width * part) for part in range(1, parallelism)]
+
+    cuts = sorted(set(cuts))
+    if not cuts:
+        return [None]
+    column = quote_name(engine, columns['period'])
+    bounds = [None] + cuts + [None]
+    return [(column, bounds[index], bounds[index + 1]) for index in range(len(bounds) - 1)]
+
+def read_period_ranges(read, period_ranges, progress=None):
+    # read(period_range, progress) -> (result, query) for every range, concurrently on separate pooled
+    # connections; results come back in period order
+    if len(period_ranges) == 1:
+        return [read(period_ranges[0], progress)]
+
+    logger.info(f"Reading rdm_port in {len(period_ranges)} period ranges in parallel: {[period_range[1:] for period_range in period_ranges]}")
+    parent_trace = current_trace()
+    rows_by_range = [0] * len(period_ranges)
+    progress_lock = threading.Lock()
+
+    def range_progress(index):
+        # one running total across the ranges instead of each range's own count
+        def report(stage_name, rows=None):
+            with progress_lock:
+                if rows is not None:
+                    rows_by_range[index] = rows
+                total = sum(rows_by_range)
+            report_progress(progress, stage_name, total if rows is not None else None)
+        return report
+
+    def read_range(index):
+        with attached(parent_trace):
+            return read(period_ranges[index], range_progress(index))
+
+    with ThreadPoolExecutor(max_workers=len(period_ranges), thread_name_prefix='rdm-port-reader') as executor:
+        return list(executor.map(read_range, range(len(period_ranges))))
+
+def concat_period_frames(frames):
+    # empty ranges are dropped so they cannot widen the dtypes of the others
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def concat_period_partitions(results):
+    merged = {}
+    for result in results:
+        for key, frame in result.items():
+            merged.setdefault(key, []).append(frame)
+    return {key: concat_period_frames(frames) for key, frames in merged.items()}
+
+def report_progress(progress, stage, rows=None):
+    # progress is an optional callable(stage, rows) used by the batch job queue
+    if progress is not None:
+        progress(stage, rows)
+
+def rdm_port_fingerprint(engine, database, columns, anlsid=None, perspcode=None):
+    # cheap change marker for the rdm_port slice; None when neither probe is permitted
+    if engine.dialect.name != 'mssql':
+        # both probes use SQL Server catalog views and checksums
+        return None
+    table = rdm_port_table(engine, database, columns['schema'])
+
+    if app.config['RESULT_CACHE_FINGERPRINT'] == 'stats':
+        query = sa.text(
+            f"SELECT SUM(ps.row_count), MAX(o.modify_date), MAX(us.last_user_update) "
+            f"FROM [{database}].sys.dm_db_partition_stats ps "
+            f"JOIN [{database}].sys.objects o ON o.object_id = ps.object_id "
+            f"LEFT JOIN sys.dm_db_index_usage_stats us ON us.database_id = DB_ID(:database) "
+            f"AND us.object_id = ps.object_id AND us.index_id = ps.index_id "
+            f"WHERE ps.object_id = OBJECT_ID(:table) AND ps.index_id IN (0, 1)"
+        )
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(query, {'database': database, 'table': table}).fetchone()
+            if row is not None and row[0] is not None:
+                return ['stats'] + [str(value) for value in row]
+        except sa.exc.DBAPIError as e:
+            logger.warning(f"Partition stats fingerprint not available, using CHECKSUM_AGG: {e}")
+
+    checksum_columns = ', '.join(f'[{col}]' for col in (columns['period'], columns['event'], columns['loss'], columns['eventdate']) if col)
+    where, params = build_rdm_port_where(anlsid, perspcode)
+    statement, params = rdm_port_statement(engine, f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM({checksum_columns})) FROM {table}{where}", params, columns)
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(statement, params).fetchone()
+        return ['checksum'] + [str(value) for value in row]
+    except sa.exc.DBAPIError as e:
+        logger.warning(f"Could not fingerprint {table}, result cache skipped: {e}")
+        return None
+
+def prepare_rdm_port(engine, database, server, aggregation=None, progress=None):
+    aggregation = aggregation or app.config['SQL_AGGREGATION']
+    if aggregation not in ('server', 'pandas'):
+        raise ValueError(f"Unknown aggregation mode '{aggregation}'. Use 'server' or 'pandas'.")
+
+    report_progress(progress, 'resolving columns')
+    with stage('resolve columns'):
+        columns = resolve_rdm_port_columns(engine, database, server)
+
+    if not all([columns['period'], columns['event'], columns['loss']]):
+        logger.error(f"Required columns not found. Available columns: {list(columns['types'])}")
         raise ValueError(f"Required columns (periodID, eventID, loss) not found in table")
-    
-    logger.info(f"Aggregating {len(df)} PLT rows into a YLT structure...")
 
-    #aggregation rules
-    agg_rules = {loss_col: 'sum' } # sum up all losses for the same event in the same year
-    
-    # if eventdate exists, use 'first'
-    if eventdate_col in df.columns: agg_rules[eventdate_col] = 'first'
+    return aggregation, columns
 
-    # group by periodid and eventid + apply the aggregation
-    ylt_df = df.groupby([period_col, event_col]).agg(agg_rules).reset_index()
-    
-    logger.info(f"Aggregation complete. Resulting YLT has {len(ylt_df)} rows.")
+def eventdate_days(eventdates):
+    # 1-based day of year and the length of that year, NaN for missing dates. The same days as
+    # subtracting .dt.to_period('Y').dt.to_timestamp(), looked up in a calendar of the date range
+    # (at most ~213k days for nanosecond timestamps) instead of converting every row to a year.
+    eventdates = pd.to_datetime(eventdates)
+    if eventdates.dt.tz is not None:
+        # local wall time (the Period-based code raised on these)
+        eventdates = eventdates.dt.tz_localize(None)
+    days = eventdates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    missing = np.isnat(days)
+    present = days[~missing] if missing.any() else days
+    if len(present) == 0:
+        return np.full(len(days), np.nan), np.full(len(days), np.nan)
+
+    first = present.min()
+    calendar = np.arange(first, present.max() + 1)
+    years = calendar.astype('datetime64[Y]')
+    year_start = years.astype('datetime64[D]')
+    calendar_day = (calendar - year_start).astype(np.int64) + 1.0
+    calendar_length = ((years + 1).astype('datetime64[D]') - year_start).astype(np.float64)
+
+    index = (days - first).astype(np.int64)
+    if missing.any():
+        index[missing] = 0
+    day = calendar_day[index]
+    days_in_year = calendar_length[index]
+    if missing.any():
+        day[missing] = np.nan
+        days_in_year[missing] = np.nan
+    return day, days_in_year
+
+def day_fraction(day, days_in_year, policy='legacy'):
+    # IFM rate column: day of year as a fraction of the year, rounded to 6 places
+    if policy not in LEAP_YEAR_POLICIES:
+        raise ValueError(f"Unknown leap year policy '{policy}'. Use one of {list(LEAP_YEAR_POLICIES)}.")
+    if policy == 'actual':
+        rate = day / days_in_year
+    else:
+        rate = day / 365.0
+        if policy == 'clip':
+            rate = np.minimum(rate, 1.0)
+    return np.round(rate, 6)
+
+def build_sql_ifm(ylt_df, columns):
+    period_col, event_col, loss_col, eventdate_col = columns['period'], columns['event'], columns['loss'], columns['eventdate']
 
     # Create final YLT structure 
     ylt = pd.DataFrame()
@@ -267,13 +1048,14 @@ def convert_sql_plt_to_ylt(engine, database, server, anlsid=None, perspcode=None
     ylt['LossType'] = 'CAT'
     ylt['SD'] = 0
     
-    if eventdate_col in ylt_df.columns:
-        ylt_df[eventdate_col] = pd.to_datetime(ylt_df[eventdate_col])
-        
+    if DAY_OF_YEAR_COL in ylt_df.columns:
+        day = ylt_df[DAY_OF_YEAR_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+        days_in_year = ylt_df[DAYS_IN_YEAR_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+        ylt['Day'] = day_fraction(day, days_in_year, app.config['LEAP_YEAR_POLICY'])
+    elif eventdate_col in ylt_df.columns:
         # Calculate day of year as a fraction
-        year_start = ylt_df[eventdate_col].dt.to_period('Y').dt.to_timestamp()
-        ylt['Day'] = ((ylt_df[eventdate_col] - year_start).dt.days + 1) / 365.0
-        ylt['Day'] = ylt['Day'].round(6)
+        day, days_in_year = eventdate_days(ylt_df[eventdate_col])
+        ylt['Day'] = day_fraction(day, days_in_year, app.config['LEAP_YEAR_POLICY'])
     else:
         # default to the start of the year (Day 1 / 365)
         ylt['Day'] = 1/365.0 
@@ -288,9 +1070,104 @@ def convert_sql_plt_to_ylt(engine, database, server, anlsid=None, perspcode=None
     ylt_ifm['zero'] = ylt['SD']
     ylt_ifm['rate'] = ylt['Day']
     ylt_ifm['intEvent'] = ylt['eventid']
+    return ylt_ifm
+
+def convert_sql_plt_to_ylt(engine, database, server, anlsid=None, perspcode=None, aggregation=None, chunksize=None, progress=None, use_cache=True, admit=None):
+
+    aggregation, columns = prepare_rdm_port(engine, database, server, aggregation, progress)
+
+    key = None
+    if use_cache and app.config['RESULT_CACHE']:
+        report_progress(progress, 'checking cache')
+        with stage('cache lookup'):
+            fingerprint = rdm_port_fingerprint(engine, database, columns, anlsid, perspcode)
+            if fingerprint is not None:
+                key = cache_key(server, database, anlsid_values(anlsid), filter_values(perspcode), aggregation, app.config['LEAP_YEAR_POLICY'], fingerprint)
+            cached = result_cache.get(key) if key is not None else None
+        if cached is not None:
+            logger.info(f"Result cache hit for {server}/{database} ANLSID {anlsid or 'All'} PERSPCODE {perspcode or 'All'}")
+            cached.attrs['cache'] = 'hit'
+            return cached
+
+    # only a conversion that reads rdm_port reserves memory; a cache hit above just loads the stored YLT
+    with admitted_sql_conversion(engine, database, columns, anlsid, aggregation, admit, progress):
+        with stage('plan ranges'):
+            period_ranges = rdm_port_period_ranges(engine, server, database, columns, *build_rdm_port_where(anlsid, perspcode))
+
+        ylt_df = None
+        if aggregation == 'server':
+            try:
+                parts = read_period_ranges(lambda period_range, range_progress: aggregate_rdm_port_on_server(
+                    engine, database, columns, anlsid, perspcode, range_progress, period_range), period_ranges, progress)
+                ylt_df, successful_query = concat_period_frames([part for part, _ in parts]), parts[0][1]
+            except sa.exc.DBAPIError as e:
+                logger.warning(f"Server-side aggregation failed, falling back to pandas aggregation: {e}")
+                aggregation = 'pandas'
+
+        if ylt_df is None:
+            parts = read_period_ranges(lambda period_range, range_progress: aggregate_rdm_port_in_pandas(
+                engine, database, columns, anlsid, perspcode, chunksize, range_progress, period_range), period_ranges, progress)
+            ylt_df, successful_query = concat_period_frames([part for part, _ in parts]), parts[0][1]
+
+        if ylt_df.empty:
+            raise ValueError(f"Query returned no data. Check your parameters (ANLSID, PERSPCODE) and table contents. Query: {successful_query}")
+
+        logger.info(f"Aggregation complete ({aggregation}). Resulting YLT has {len(ylt_df)} rows.")
+        report_progress(progress, 'building YLT')
+
+        with stage('build YLT') as counter:
+            ylt_ifm = build_sql_ifm(ylt_df, columns)
+            counter['rows'] = len(ylt_ifm)
+        ylt_ifm.attrs['aggregation'] = aggregation
+
+    if key is not None:
+        try:
+            with stage('cache store'):
+                result_cache.put(key, ylt_ifm)
+        except Exception as e:
+            logger.warning(f"Could not store result in cache: {e}")
+        ylt_ifm.attrs['cache'] = 'miss'
     
     return ylt_ifm
 
+def convert_sql_partitions_to_ylt(engine, database, server, partitions, aggregation=None, chunksize=None, progress=None, admit=None):
+    # one rdm_port scan for several (ANLSID, PERSPCODE) pairs; returns (ANLSID, PERSPCODE) -> IFM frame
+    aggregation, columns = prepare_rdm_port(engine, database, server, aggregation, progress)
+
+    with admitted_sql_conversion(engine, database, columns, list(partitions), aggregation, admit, progress):
+        with stage('plan ranges'):
+            period_ranges = rdm_port_period_ranges(engine, server, database, columns, *build_rdm_port_partition_where(partitions))
+
+        results = None
+        if aggregation == 'server':
+            try:
+                parts = read_period_ranges(lambda period_range, range_progress: aggregate_rdm_port_partitions_on_server(
+                    engine, database, columns, partitions, range_progress, period_range), period_ranges, progress)
+                results, successful_query = concat_period_partitions([part for part, _ in parts]), parts[0][1]
+            except sa.exc.DBAPIError as e:
+                logger.warning(f"Server-side partitioned aggregation failed, falling back to pandas aggregation: {e}")
+                aggregation = 'pandas'
+
+        if results is None:
+            parts = read_period_ranges(lambda period_range, range_progress: aggregate_rdm_port_partitions_in_pandas(
+                engine, database, columns, partitions, chunksize, range_progress, period_range), period_ranges, progress)
+            results, successful_query = concat_period_partitions([part for part, _ in parts]), parts[0][1]
+
+        if not results:
+            raise ValueError(f"Query returned no data. Check your parameters (ANLSID, PERSPCODE) and table contents. Query: {successful_query}")
+
+        logger.info(f"Partitioned aggregation complete ({aggregation}). {len(results)} partitions.")
+        report_progress(progress, 'building YLT')
+
+        ylt_frames = {}
+        for key, ylt_df in results.items():
+            with stage('build YLT') as counter:
+                ylt_ifm = build_sql_ifm(ylt_df, columns)
+                counter['rows'] = len(ylt_ifm)
+            ylt_ifm.attrs['aggregation'] = aggregation
+            ylt_frames[key] = ylt_ifm
+        return ylt_frames
+
 def get_credentials_for_server(server):
     if server == 'DATABRIDGE' and 'databridge_credentials' in session:
         logger.info("Using DATABRIDGE specific credentials.")
@@ -301,6 +1178,128 @@ def get_credentials_for_server(server):
         creds = session.get('credentials', {})
         return creds.get('username'), creds.get('password'), creds.get('domain')
 
+def session_owner():
+    creds = session.get('credentials', {})
+    return f"{creds.get('domain')}\\{creds.get('username')}" if creds.get('domain') else creds.get('username')
+
+# converted YLTs waiting to be downloaded: result_id -> record, the file itself is in RESULT_DIR
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+def store_result(ylt_df, filename, stats, output_format='csv'):
+    # the YLT is written out in its output format right away, so no frame stays in memory while the
+    # link waits to be used
+    purge_results()
+    os.makedirs(app.config['RESULT_DIR'], exist_ok=True)
+    result_id = uuid.uuid4().hex
+    path = os.path.join(app.config['RESULT_DIR'], result_id)
+    try:
+        with stage('write output') as counter, open(path, 'wb') as result_file:
+            write_output(ylt_df, output_format, result_file, export_chunk_rows(output_format))
+            counter['rows'] = len(ylt_df)
+    except BaseException:
+        remove_result_files([{'path': path}])
+        raise
+
+    with _results_lock:
+        _results[result_id] = {
+            'owner': session_owner(),
+            'created': time.time(),
+            'path': path,
+            'rows': len(ylt_df),
+            'filename': filename,
+            'format': output_format,
+            'stats': stats,
+        }
+        evicted = []
+        while len(_results) > app.config['RESULT_STORE_SIZE']:
+            evicted.append(_results.popitem(last=False)[1])
+    remove_result_files(evicted)
+    return result_id
+
+def purge_results():
+    # runs on every store and download; also sweeps files no record points to any more (an earlier
+    # process, or a file Windows would not delete while it was being downloaded)
+    cutoff = time.time() - app.config['RESULT_TTL']
+    with _results_lock:
+        expired = [_results.pop(result_id) for result_id, record in list(_results.items()) if record['created'] < cutoff]
+        known = set(_results)
+    remove_result_files(expired)
+    try:
+        names = os.listdir(app.config['RESULT_DIR'])
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(app.config['RESULT_DIR'], name)
+        try:
+            stale = name not in known and os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            remove_result_files([{'path': path}])
+
+def discard_result(result_id):
+    with _results_lock:
+        record = _results.pop(result_id, None)
+    if record is not None:
+        remove_result_files([record])
+
+def remove_result_files(records):
+    for record in records:
+        try:
+            os.remove(record['path'])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove stored result {record['path']}: {e}")
+
+def result_file_blocks(result_id, result_file, block_size=1024 * 1024):
+    # a finished download releases the result; an aborted one can be retried until RESULT_TTL
+    with result_file:
+        while True:
+            block = result_file.read(block_size)
+            if not block:
+                break
+            yield block
+    discard_result(result_id)
+
+def export_chunk_rows(output_format):
+    # CSV is written in small blocks, columnar formats in row-group sized batches
+    return app.config['DOWNLOAD_CHUNK_ROWS'] if output_format.startswith('csv') else app.config['ARROW_BATCH_ROWS']
+
+def conversion_response(ylt_df, filename, stats, mode=None, output_format='csv'):
+    # 'download' keeps the frame server-side and returns a link, anything else inlines the CSV as before;
+    # binary formats cannot be inlined in JSON so they are always downloads
+    if mode == 'download' or output_format != 'csv':
+        filename = output_filename(filename, output_format)
+        result_id = store_result(ylt_df, filename, stats, output_format)
+        stats = with_trace(stats)
+        return jsonify({'success': True, 'filename': filename, 'format': output_format, 'download_url': url_for('download_result', result_id=result_id), **stats})
+
+    with stage('write output') as counter:
+        data = ifm_csv(ylt_df)
+        counter['rows'] = len(ylt_df)
+    return jsonify({'success': True, 'filename': filename, 'data': data, **with_trace(stats)})
+
+def with_trace(stats):
+    # stage timings of the running conversion go back to the client next to the stats
+    current = current_trace()
+    return {**stats, 'trace': current.to_dict()} if current is not None else stats
+
+def traced_route(name):
+    # runs a view inside a trace; error responses are recorded as failed conversions
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with trace(name) as current:
+                response = view(*args, **kwargs)
+                status = response[1] if isinstance(response, tuple) else response.status_code
+                if status >= 400:
+                    current.finish('error')
+                return response
+        return wrapper
+    return decorator
+
 
 @app.route('/')
 def index():
@@ -317,7 +1316,9 @@ def login():
         domain = None
         if '\\' in username:
             domain, username = username.split('\\', 1)
-        
+
+        # a new login starts with fresh lists; the previous one's entries are dropped
+        forget_session_catalogs()
         session['credentials'] = {
             'username': username,
             'password': password,
@@ -347,6 +1348,7 @@ def dashboard():
     return render_template('dashboard.html', edm_servers=EDM_SERVERS)
 
 @app.route('/convert_sql', methods=['POST'])
+@traced_route('convert_sql')
 def convert_sql():
     try:
         data = request.json
@@ -357,10 +1359,19 @@ def convert_sql():
         database = data.get('database')
         anlsid = data.get('anlsid')
         perspcode = data.get('perspcode')
+        aggregation = data.get('aggregation')
+        mode = data.get('mode')
         
         if not all([server, database]):
             return jsonify({'error': 'Server and Database are required'}), 400
         
+        try:
+            output_format = resolve_output_format(data.get('format') or app.config['OUTPUT_FORMAT'])
+            # a non-integer ANLSID is a bad request, checked before connecting
+            anlsid_values(anlsid)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         #  credentials
         username, password, domain = get_credentials_for_server(server)
         
@@ -368,44 +1379,31 @@ def convert_sql():
             return jsonify({'error': 'Missing credentials. Please login again.'}), 401
         
         #  engine 
-        engine = get_engine(server, database, username, password, domain)
-        ylt_df = convert_sql_plt_to_ylt(engine, database, server, anlsid, perspcode)
-        
-        # calculate AAL dynamically 
-        numeric_rows = ylt_df[pd.to_numeric(ylt_df['intYear'], errors='coerce').notna()].copy()
+        with stage('connect'):
+            engine = get_engine(server, database, username, password, domain)
+
+        # queued, or refused with 429/503, when it would not fit next to the conversions already running
+        ylt_df = convert_sql_plt_to_ylt(engine, database, server, anlsid, perspcode, aggregation, admit=False)
+
+        # AAL, std and EP points
+        with stage('metrics'):
+            metrics = ylt_metrics(ylt_df)
         
+        # anlsid and perspcode may also be lists, converted together in one query
+        anlsid = '-'.join(filter_values(anlsid))
+        perspcode = '-'.join(filter_values(perspcode))
+
         #  metadata header
         name = 'N/A'
         curr = 'N/A'
         if anlsid:
             anlsids_dict = session.get('anlsids', {})
-            anlsid_info = anlsids_dict.get(str(anlsid))
+            anlsid_info = anlsids_dict.get(anlsid)
             if anlsid_info:
                 name = anlsid_info.get('name', 'N/A')
                 curr = anlsid_info.get('curr', 'N/A')
 
         
-        if len(numeric_rows) > 0:
-            #  columns are numeric 
-            numeric_rows['dblLoss'] = pd.to_numeric(numeric_rows['dblLoss'], errors='coerce')
-            numeric_rows['intYear'] = pd.to_numeric(numeric_rows['intYear'], errors='coerce')
-            
-            total_loss = numeric_rows['dblLoss'].sum()
-            
-            # calculate AAL based on the number of simulation years (max period)
-            num_years = numeric_rows['intYear'].max()
-            aal = total_loss / num_years if num_years > 0 else 0
-        else:
-            aal = 0
-        
-        #  to CSV string
-        output = io.StringIO()
-        ylt_df.to_csv(output, index=False, header=False)
-        data_csv_content = output.getvalue()
-
-        #  prepend metadata 
-        csv_content = data_csv_content
-        
         #  filename
         filename_parts = ['YLT']
         if anlsid:
@@ -415,19 +1413,258 @@ def convert_sql():
         filename_parts.append('IFM.csv')
         output_filename = '_'.join(filename_parts)
         
-        return jsonify({
-            'success': True,
-            'filename': output_filename,
-            'data': csv_content,
-            'rows': len(numeric_rows),
-            'aal': aal,
+        return conversion_response(ylt_df, output_filename, {
+            **metrics,
+            'aggregation': ylt_df.attrs.get('aggregation'),
+            'cache': ylt_df.attrs.get('cache'),
             'query_info': f"Database: {database}, ANLSID: {anlsid or 'All'}, Name: {name if anlsid else 'All'}, Currency: {curr if anlsid else 'All'}, PERSPCODE: {perspcode or 'All'}"
-        })
-        
+        }, mode, output_format)
+
+    except AdmissionRejected as e:
+        logger.warning(f"SQL conversion not admitted: {e}")
+        return admission_response(e)
     except Exception as e:
         logger.error(f"SQL conversion error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+_server_slots = {}
+_server_slots_lock = threading.Lock()
+
+def server_slot(server):
+    # shared across requests so concurrent batches together respect the per-server limit
+    with _server_slots_lock:
+        if server not in _server_slots:
+            _server_slots[server] = threading.BoundedSemaphore(app.config['BATCH_PER_SERVER_CONCURRENCY'])
+        return _server_slots[server]
+
+def run_batch_job(job, credentials, progress=None, admit=None):
+    server = job.get('server')
+    database = job.get('database')
+    anlsid = job.get('anlsid')
+    perspcode = job.get('perspcode')
+
+    try:
+        username, password, domain = credentials
+        if not username or not password:
+            raise Exception(f"Missing credentials for server {server}")
+
+        report_progress(progress, 'waiting for server')
+        with server_slot(server):
+            report_progress(progress, 'connecting')
+            with stage('connect'):
+                engine = get_engine(server, database, username, password, domain)
+
+            # convert to YLT; background jobs (admit=True) wait for memory, /convert_batch admitted the whole request
+            ylt_df = convert_sql_plt_to_ylt(engine, database, server, anlsid, perspcode, job.get('aggregation'), progress=progress, admit=admit)
+
+        report_progress(progress, 'writing output')
+        result = batch_result(ylt_df, database, anlsid, perspcode, job.get('format', 'csv'))
+        report_progress(progress, 'done')
+        return result
+
+    except Exception as e:
+        logger.error(f"Failed to process batch job {job}: {e}", exc_info=True)
+        report_progress(progress, 'failed')
+        return batch_error(server, database, anlsid, perspcode, e)
+
+def batch_result(ylt_df, database, anlsid, perspcode, output_format='csv'):
+    # calculate stats
+    with stage('metrics'):
+        metrics = ylt_metrics(ylt_df)
+
+    #  file content, spooled to a temporary file so the member is never held in memory as one bytes object
+    with stage('write output') as counter:
+        content = tempfile.TemporaryFile()
+        try:
+            write_output(ylt_df, output_format, content, export_chunk_rows(output_format))
+        except BaseException:
+            content.close()
+            raise
+        counter['rows'] = len(ylt_df)
+
+    #  filename
+    filename_parts = ['YLT']
+    if anlsid:
+        filename_parts.append(f'ANLSID{anlsid}')
+    if perspcode:
+        filename_parts.append(perspcode)
+    filename_parts.append(f'{database}_IFM.csv')
+    filename = output_filename('_'.join(filter(None, filename_parts)), output_format)
+
+    summary = {
+        'filename': filename,
+        'format': output_format,
+        **metrics,
+        'aggregation': ylt_df.attrs.get('aggregation'),
+        'cache': ylt_df.attrs.get('cache'),
+        'query_info': f"DB: {database}, ANLSID: {anlsid or 'All'}, PERSPCODE: {perspcode or 'All'}"
+    }
+    return filename, content, summary
+
+def batch_error(server, database, anlsid, perspcode, error):
+    error_filename = f"ERROR_ANLSID{anlsid or 'All'}{f'_{perspcode}' if perspcode else ''}_{database}.txt"
+    error_content = f"Failed to process job for:\nServer: {server}\nDatabase: {database}\nANLSID: {anlsid or 'All'}\nPERSPCODE: {perspcode or 'All'}\n\nError: {str(error)}"
+    return error_filename, error_content, {'filename': error_filename, 'error': str(error)}
+
+def run_fanout_job(job, credentials, progress=None, admit=None):
+    # one scan of rdm_port for every (ANLSID, PERSPCODE) in the job, one IFM file per partition
+    server = job['server']
+    database = job['database']
+    partitions = job['partitions']
+
+    try:
+        username, password, domain = credentials
+        if not username or not password:
+            raise Exception(f"Missing credentials for server {server}")
+
+        report_progress(progress, 'waiting for server')
+        with server_slot(server):
+            report_progress(progress, 'connecting')
+            with stage('connect'):
+                engine = get_engine(server, database, username, password, domain)
+            ylt_frames = convert_sql_partitions_to_ylt(engine, database, server, partitions, job.get('aggregation'), progress=progress, admit=admit)
+
+        report_progress(progress, 'writing output')
+        results = []
+        for anlsid, perspcodes in partitions.items():
+            found = [key for key in ylt_frames if key[0] == anlsid]
+            if perspcodes is not None:
+                found = [(anlsid, code) for code in perspcodes]
+            if not found:
+                results.append(batch_error(server, database, anlsid, None, ValueError("Query returned no data for this ANLSID")))
+            for key in found:
+                if key not in ylt_frames:
+                    results.append(batch_error(server, database, anlsid, key[1], ValueError("Query returned no data for this PERSPCODE")))
+                    continue
+                results.append(batch_result(ylt_frames.pop(key), database, *key, job.get('format', 'csv')))
+        report_progress(progress, 'done')
+        return results
+
+    except Exception as e:
+        logger.error(f"Failed to process fan-out batch job {job}: {e}", exc_info=True)
+        report_progress(progress, 'failed')
+        return [batch_error(server, database, '_'.join(partitions), None, e)]
+
+def run_batch_task(job, credentials, progress=None, admit=None):
+    with trace('batch_fanout' if job.get('fanout') else 'batch_job') as job_trace:
+        if job.get('fanout'):
+            results = run_fanout_job(job, credentials, progress, admit)
+        else:
+            results = [run_batch_job(job, credentials, progress, admit)]
+
+        if any('error' in summary for _, _, summary in results):
+            job_trace.finish('error')
+        # a fan-out scan is shared by all of its files, so each summary carries the same trace
+        job_summary_trace = job_trace.to_dict()
+        for _, _, summary in results:
+            summary['trace'] = job_summary_trace
+        return results
+
+def group_fanout_jobs(valid_jobs):
+    # merges fan-out jobs that read the same rdm_port into a single scan; an "All" PERSPCODE
+    # job then yields one file per PERSPCODE instead of one summed file
+    grouped = []
+    groups = {}
+    for job, credentials in valid_jobs:
+        if not job.get('fanout') or not job.get('anlsid'):
+            grouped.append((job, credentials))
+            continue
+
+        key = (job['server'], job['database'], job.get('aggregation'), job.get('format'), credentials)
+        if key not in groups:
+            groups[key] = {
+                'server': job['server'],
+                'database': job['database'],
+                'aggregation': job.get('aggregation'),
+                'format': job.get('format'),
+                'fanout': True,
+                'partitions': {},
+            }
+            grouped.append((groups[key], credentials))
+
+        # keyed the way split_partitions keys the scan's rows, so run_fanout_job finds every code it asked for
+        partitions = groups[key]['partitions']
+        anlsid = str(anlsid_values(job['anlsid'])[0])
+        perspcode = str(job.get('perspcode') or '').strip()
+        if not perspcode:
+            partitions[anlsid] = None
+        elif anlsid not in partitions:
+            partitions[anlsid] = [perspcode]
+        elif partitions[anlsid] is not None and perspcode not in partitions[anlsid]:
+            partitions[anlsid].append(perspcode)
+    return grouped
+
+def batch_job_label(job):
+    if job.get('fanout'):
+        anlsids = ', '.join(f"{anlsid} ({'All' if codes is None else ', '.join(codes)})" for anlsid, codes in job['partitions'].items())
+        return f"{job.get('database')} / single scan / ANLSID {anlsids}"
+    return f"{job.get('database')} / ANLSID {job.get('anlsid') or 'All'} / PERSPCODE {job.get('perspcode') or 'All'}"
+
+def collect_batch_jobs(jobs, output_format=None):
+    # output_format is the batch-wide default, a job may still pick its own
+    valid_jobs = []
+    for job in jobs:
+        if not all([job.get('server'), job.get('database')]):
+            logger.warning(f"Skipping invalid batch job: {job}")
+            continue
+        job['format'] = resolve_output_format(job.get('format') or output_format or app.config['OUTPUT_FORMAT'])
+        # session is only available on the request thread
+        valid_jobs.append((job, get_credentials_for_server(job.get('server'))))
+    return group_fanout_jobs(valid_jobs)
+
+def add_zip_member(zip_file, filename, content, output_format):
+    # content is an error text or the temporary file batch_result wrote, copied in blocks and closed
+    if isinstance(content, str):
+        zip_file.writestr(filename, content)
+        return
+    info = zipfile.ZipInfo(filename, time.localtime()[:6])
+    # deflating gzip/zstd/Parquet members again only costs time
+    info.compress_type = zipfile.ZIP_STORED if is_compressed(output_format) else zipfile.ZIP_DEFLATED
+    # the size up front lets zipfile pick ZIP64 for members over 2 GiB
+    info.file_size = content.seek(0, os.SEEK_END)
+    content.seek(0)
+    with content, zip_file.open(info, 'w') as member:
+        shutil.copyfileobj(content, member, 1024 * 1024)
+
+def batch_concurrency(valid_jobs):
+    # jobs of a batch running at once, given BATCH_MAX_WORKERS and BATCH_PER_SERVER_CONCURRENCY
+    per_server = {}
+    for job, _ in valid_jobs:
+        per_server[job['server']] = per_server.get(job['server'], 0) + 1
+    running = sum(min(count, app.config['BATCH_PER_SERVER_CONCURRENCY']) for count in per_server.values())
+    return min(app.config['BATCH_MAX_WORKERS'], running)
+
+def batch_memory_estimate(valid_jobs):
+    # /convert_batch is admitted once for all of its jobs, before any of them connects, so nothing is
+    # known about their rows; each job running at once reserves ADMISSION_DEFAULT_BYTES
+    return batch_concurrency(valid_jobs) * app.config['ADMISSION_DEFAULT_BYTES']
+
+def run_batch(valid_jobs, zip_file, progress_for=None, admit=None):
+    # admit=True for background batches, whose jobs each wait for memory; a synchronous batch runs its
+    # jobs under the reservation its request took (admit=None)
+    summaries = [None] * len(valid_jobs)
+    if not valid_jobs:
+        return []
+
+    max_workers = min(app.config['BATCH_MAX_WORKERS'], len(valid_jobs))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as executor:
+        futures = {
+            executor.submit(run_batch_task, job, credentials, progress_for(index) if progress_for else None, admit): index
+            for index, (job, credentials) in enumerate(valid_jobs)
+        }
+
+        # write each result as soon as its job finishes
+        for future in as_completed(futures):
+            job_summaries = []
+            for filename, content, summary in future.result():
+                add_zip_member(zip_file, filename, content, summary.get('format', 'csv'))
+                logger.info(f"Added {filename} to batch zip.")
+                job_summaries.append(summary)
+            summaries[futures[future]] = job_summaries
+
+    # keep the submission order, fan-out jobs contribute one summary per partition
+    return [summary for job_summaries in summaries for summary in job_summaries]
+
 @app.route('/convert_batch', methods=['POST'])
 def convert_batch():
     try:
@@ -435,90 +1672,17 @@ def convert_batch():
         if not jobs:
             return jsonify({'error': 'No batch jobs provided'}), 400
 
-        zip_buffer = io.BytesIO()
-        summaries = []
-
-        with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED) as zip_file:
-            for job in jobs:
-                server = job.get('server')
-                database = job.get('database')
-                anlsid = job.get('anlsid')
-                perspcode = job.get('perspcode')
+        try:
+            valid_jobs = collect_batch_jobs(jobs, request.json.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-                if not all([server, database]):
-                    logger.warning(f"Skipping invalid batch job: {job}")
-                    continue
+        # one reservation for the whole request: its jobs never queue behind or reject each other
+        zip_buffer = io.BytesIO()
+        with admission.admit(batch_memory_estimate(valid_jobs)):
+            with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED) as zip_file:
+                summaries = run_batch(valid_jobs, zip_file)
 
-                output_filename = "error.txt"
-                try:
-                    #  credentials and engine
-                    username, password, domain = get_credentials_for_server(server)
-                    if not username or not password:
-                        raise Exception(f"Missing credentials for server {server}")
-                    
-                    engine = get_engine(server, database, username, password, domain)
-
-                    # convert to YLT
-                    ylt_df = convert_sql_plt_to_ylt(engine, database, server, anlsid, perspcode)
-
-                    # calculate stats
-                    numeric_rows = ylt_df[pd.to_numeric(ylt_df['intYear'], errors='coerce').notna()].copy()
-                    aal = 0
-                    if len(numeric_rows) > 0:
-                        numeric_rows['dblLoss'] = pd.to_numeric(numeric_rows['dblLoss'], errors='coerce')
-                        numeric_rows['intYear'] = pd.to_numeric(numeric_rows['intYear'], errors='coerce')
-                        total_loss = numeric_rows['dblLoss'].sum()
-                        num_years = numeric_rows['intYear'].max()
-                        aal = total_loss / num_years if num_years > 0 else 0
-
-                    # add metadata
-                    name = 'N/A'
-                    curr = 'N/A'
-                    if anlsid:
-                        anlsids_dict = session.get('anlsids', {})
-                        anlsid_info = anlsids_dict.get(str(anlsid))
-                        if anlsid_info:
-                            name = anlsid_info.get('name', 'N/A')
-                            curr = anlsid_info.get('curr', 'N/A')
-                    
-                    #  CSV content
-                    output = io.StringIO()
-                    ylt_df.to_csv(output, index=False, header=False)
-                    data_csv_content = output.getvalue()
-                    
-                    csv_content = data_csv_content
-
-                    #  filename
-                    filename_parts = ['YLT']
-                    if anlsid:
-                        filename_parts.append(f'ANLSID{anlsid}')
-                    if perspcode:
-                        filename_parts.append(perspcode)
-                    filename_parts.append(f'{database}_IFM.csv')
-                    output_filename = '_'.join(filter(None, filename_parts))
-
-                    # add file to zip
-                    zip_file.writestr(output_filename, csv_content)
-                    logger.info(f"Added {output_filename} to batch zip.")
-
-                    # add  summary
-                    summaries.append({
-                        'filename': output_filename,
-                        'rows': len(numeric_rows),
-                        'aal': aal,
-                        'query_info': f"DB: {database}, ANLSID: {anlsid or 'All'}, PERSPCODE: {perspcode or 'All'}"
-                    })
-
-                except Exception as e:
-                    logger.error(f"Failed to process batch job {job}: {e}", exc_info=True)
-                    error_filename = f"ERROR_ANLSID{anlsid or 'All'}_{database}.txt"
-                    error_content = f"Failed to process job for:\nServer: {server}\nDatabase: {database}\nANLSID: {anlsid or 'All'}\nPERSPCODE: {perspcode or 'All'}\n\nError: {str(e)}"
-                    zip_file.writestr(error_filename, error_content)
-                    summaries.append({
-                        'filename': error_filename,
-                        'error': str(e)
-                    })
-        
         zip_buffer.seek(0)
         zip_base64 = base64.b64encode(zip_buffer.getvalue()).decode('utf-8')
 
@@ -528,10 +1692,284 @@ def convert_batch():
             'zip_data': zip_base64
         })
 
+    except AdmissionRejected as e:
+        logger.warning(f"Batch conversion not admitted: {e}")
+        return admission_response(e)
     except Exception as e:
         logger.error(f"Batch conversion error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+# background batch jobs: job_id -> status record, zips are written to BATCH_JOB_DIR
+_batch_jobs = {}
+_batch_jobs_lock = threading.Lock()
+
+def purge_batch_jobs():
+    cutoff = time.time() - app.config['BATCH_JOB_TTL']
+    with _batch_jobs_lock:
+        expired = [job_id for job_id, record in _batch_jobs.items() if record['finished'] and record['finished'] < cutoff]
+        records = [_batch_jobs.pop(job_id) for job_id in expired]
+    for record in records:
+        logger.info(f"Removing expired batch job {record['id']}")
+        try:
+            os.remove(record['zip_path'])
+        except FileNotFoundError:
+            pass
+
+def update_sub_job(record, index, stage, rows=None):
+    with _batch_jobs_lock:
+        sub_job = record['sub_jobs'][index]
+        if sub_job['started'] is None and stage != 'queued':
+            sub_job['started'] = time.time()
+        if stage in ('done', 'failed'):
+            sub_job['finished'] = time.time()
+        sub_job['stage'] = stage
+        if rows is not None:
+            sub_job['rows'] = rows
+
+def run_batch_in_background(record, valid_jobs):
+    with _batch_jobs_lock:
+        record['status'] = 'running'
+
+    partial_path = record['zip_path'] + '.part'
+    try:
+        with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            summaries = run_batch(valid_jobs, zip_file, lambda index: lambda stage, rows=None: update_sub_job(record, index, stage, rows), admit=True)
+        os.replace(partial_path, record['zip_path'])
+        with _batch_jobs_lock:
+            record['summaries'] = summaries
+            record['status'] = 'done'
+        logger.info(f"Batch job {record['id']} finished with {len(summaries)} results")
+    except Exception as e:
+        logger.error(f"Batch job {record['id']} failed: {e}", exc_info=True)
+        with _batch_jobs_lock:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    finally:
+        with _batch_jobs_lock:
+            record['finished'] = time.time()
+
+@app.route('/submit_batch', methods=['POST'])
+def submit_batch():
+    try:
+        if 'credentials' not in session:
+            return jsonify({'error': 'Missing credentials. Please login again.'}), 401
+
+        jobs = request.json.get('jobs', [])
+        if not jobs:
+            return jsonify({'error': 'No batch jobs provided'}), 400
+
+        try:
+            valid_jobs = collect_batch_jobs(jobs, request.json.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not valid_jobs:
+            return jsonify({'error': 'No valid batch jobs provided'}), 400
+
+        purge_batch_jobs()
+        os.makedirs(app.config['BATCH_JOB_DIR'], exist_ok=True)
+
+        job_id = uuid.uuid4().hex
+        record = {
+            'id': job_id,
+            'owner': session_owner(),
+            'status': 'queued',
+            'created': time.time(),
+            'finished': None,
+            'error': None,
+            'summaries': None,
+            'zip_path': os.path.join(app.config['BATCH_JOB_DIR'], f'{job_id}.zip'),
+            'sub_jobs': [
+                {
+                    'label': batch_job_label(job),
+                    'stage': 'queued',
+                    'rows': 0,
+                    'started': None,
+                    'finished': None,
+                }
+                for job, _ in valid_jobs
+            ],
+        }
+        with _batch_jobs_lock:
+            _batch_jobs[job_id] = record
+
+        threading.Thread(target=run_batch_in_background, args=(record, valid_jobs), name=f'batch-{job_id[:8]}', daemon=True).start()
+        logger.info(f"Submitted batch job {job_id} with {len(valid_jobs)} sub-jobs")
+
+        return jsonify({'success': True, 'job_id': job_id})
+
+    except Exception as e:
+        logger.error(f"Batch submission error: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+def get_batch_record(job_id):
+    with _batch_jobs_lock:
+        record = _batch_jobs.get(job_id)
+    if record is None or record['owner'] != session_owner():
+        return None
+    return record
+
+@app.route('/batch_status/<job_id>')
+def batch_status(job_id):
+    record = get_batch_record(job_id)
+    if record is None:
+        return jsonify({'error': 'Batch job not found'}), 404
+
+    now = time.time()
+    with _batch_jobs_lock:
+        sub_jobs = [
+            {
+                'label': sub_job['label'],
+                'stage': sub_job['stage'],
+                'rows': sub_job['rows'],
+                'elapsed': round((sub_job['finished'] or now) - sub_job['started'], 1) if sub_job['started'] else 0,
+            }
+            for sub_job in record['sub_jobs']
+        ]
+        status = {
+            'success': True,
+            'job_id': job_id,
+            'status': record['status'],
+            'elapsed': round((record['finished'] or now) - record['created'], 1),
+            'sub_jobs': sub_jobs,
+        }
+        if record['status'] == 'done':
+            status['summaries'] = record['summaries']
+            status['download_url'] = url_for('download_batch', job_id=job_id)
+        if record['error']:
+            status['error'] = record['error']
+
+    return jsonify(status)
+
+@app.route('/download_batch/<job_id>')
+def download_batch(job_id):
+    record = get_batch_record(job_id)
+    if record is None or record['status'] != 'done':
+        return jsonify({'error': 'Batch job not found or not finished'}), 404
+
+    return send_file(record['zip_path'], mimetype='application/zip', as_attachment=True, download_name='YLT_Batch_Conversion.zip')
+
+def catalog_key(kind, server, database, username, password, domain, *params):
+    # one entry per login, so users never see lists their own permissions would not show
+    return (kind, *_engine_key(server, database, username, password, domain), *params)
+
+def forget_login_catalogs(username, password, domain, server=None):
+    # drops the lists and RDM schema maps cached for one login, on every server or only one; the schema
+    # maps are keyed by the engine URL's user name, which carries the domain
+    _, _, *login = _engine_key(None, None, username, password, domain)
+    logins = {tuple(login)}
+    if domain:
+        logins.add((f"{domain}\\{username}", None, login[2]))
+    catalog_cache.invalidate(lambda key: tuple(key[3:6]) in logins and (server is None or key[1] == server))
+
+def forget_session_catalogs():
+    # the lists of the logins this session used, when it logs in again or out
+    for name in ('credentials', 'databridge_credentials'):
+        creds = session.get(name)
+        if creds and creds.get('username'):
+            forget_login_catalogs(creds.get('username'), creds.get('password'), creds.get('domain'))
+
+def forget_failed_catalogs(server, error):
+    # a login that can no longer connect (password changed, rights revoked) must not keep being
+    # served its cached lists on that server
+    if isinstance(error, sa.exc.DBAPIError):
+        username, password, domain = get_credentials_for_server(server)
+        if username:
+            forget_login_catalogs(username, password, domain, server)
+
+# the loaders run on a request thread for the first load and on a refresh thread afterwards,
+# so they take credentials rather than touching the session
+
+def load_databases(server, username, password, domain):
+    engine = get_engine(server, 'master', username, password, domain)
+    with engine.connect() as conn:
+        result = conn.execute(sa.text("SELECT name FROM sys.databases WHERE database_id > 4 ORDER BY name"))
+        return [row[0] for row in result]
+
+def load_anlsids(server, database, username, password, domain):
+    engine = get_engine(server, database, username, password, domain)
+    schema = rdm_table_schema(engine, server, database, 'rdm_analysis')
+    if schema is None:
+        logger.warning(f"Table 'rdm_analysis' not found in {database}")
+        return None
+    with engine.connect() as conn:
+        try:
+            query = sa.text(f"SELECT DISTINCT ID, NAME, CURR, PERIL FROM [{database}].[{schema}].[rdm_analysis] ORDER BY ID")
+            result = conn.execute(query)
+            anlsids = [(row[0], row[1], row[2], row[3]) for row in result]
+            logger.info(f"Found ANLSIDs with full details from '{schema}.rdm_analysis'")
+            return anlsids
+        except Exception as e:
+            logger.warning(f"Could not get full details from 'rdm_analysis': {e}")
+            return None
+
+def anlspersp_perspcodes(conn, database, schema, anlsid):
+    # PERSPCODEs from the small rdm_anlspersp table
+    query = sa.text(f"SELECT DISTINCT PERSPCODE FROM [{database}].[{schema}].[rdm_anlspersp] WHERE ANLSID = :anlsid ORDER BY PERSPCODE")
+    perspcodes = [row[0] for row in conn.execute(query, {'anlsid': anlsid})]
+    logger.info(f"Found PERSPCODEs in schema '{schema}' for ANLSID {anlsid}")
+    return perspcodes
+
+def rdm_port_has_perspective_index(conn, database, table):
+    # True when a rowstore index on rdm_port starts with (ANLSID, PERSPCODE), so each distinct
+    # PERSPCODE of an analysis is one index seek
+    query = sa.text(
+        f"SELECT ic.index_id, ic.key_ordinal, c.name FROM [{database}].sys.indexes i "
+        f"JOIN [{database}].sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id "
+        f"JOIN [{database}].sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id "
+        f"WHERE i.object_id = OBJECT_ID(:table) AND i.type IN (1, 2) AND ic.key_ordinal IN (1, 2)"
+    )
+    try:
+        rows = conn.execute(query, {'table': table}).fetchall()
+    except sa.exc.DBAPIError as e:
+        logger.warning(f"Could not read the indexes of {table}: {e}")
+        return False
+    keys = {}
+    for index_id, key_ordinal, name in rows:
+        keys.setdefault(index_id, {})[key_ordinal] = name.upper()
+    return any(columns.get(1) == 'ANLSID' and columns.get(2) == 'PERSPCODE' for columns in keys.values())
+
+def rdm_port_perspcodes(conn, database, schema, anlsid):
+    table = f"[{database}].[{schema}].[rdm_port]"
+    if not rdm_port_has_perspective_index(conn, database, table):
+        # no index to skip through; the cache keeps this scan to one per refresh
+        query = sa.text(f"SELECT DISTINCT PERSPCODE FROM {table} WHERE ANLSID = :anlsid ORDER BY PERSPCODE")
+        return [row[0] for row in conn.execute(query, {'anlsid': anlsid})]
+
+    # loose index scan: one TOP (1) seek per distinct PERSPCODE instead of reading every row
+    first = sa.text(f"SELECT TOP (1) PERSPCODE FROM {table} WHERE ANLSID = :anlsid AND PERSPCODE IS NOT NULL ORDER BY PERSPCODE")
+    following = sa.text(f"SELECT TOP (1) PERSPCODE FROM {table} WHERE ANLSID = :anlsid AND PERSPCODE > :previous ORDER BY PERSPCODE")
+    perspcodes = []
+    row = conn.execute(first, {'anlsid': anlsid}).fetchone()
+    while row is not None:
+        perspcodes.append(row[0])
+        row = conn.execute(following, {'anlsid': anlsid, 'previous': row[0]}).fetchone()
+    return perspcodes
+
+def load_perspcodes(server, database, anlsid, username, password, domain):
+    engine = get_engine(server, database, username, password, domain)
+    anlspersp_schema = rdm_table_schema(engine, server, database, 'rdm_anlspersp')
+    with engine.connect() as conn:
+        if server != 'DATABRIDGE':
+            if anlspersp_schema is None:
+                logger.warning(f"Table 'rdm_anlspersp' not found in {database}")
+                return None
+            return anlspersp_perspcodes(conn, database, anlspersp_schema, anlsid)
+
+        # DATABRIDGE: the perspective table when it is there, otherwise rdm_port itself
+        if anlspersp_schema is not None:
+            perspcodes = anlspersp_perspcodes(conn, database, anlspersp_schema, anlsid)
+            if perspcodes:
+                return perspcodes
+        port_schema = rdm_table_schema(engine, server, database, 'rdm_port')
+        if port_schema is None:
+            logger.warning(f"Table 'rdm_port' not found in {database}")
+            return None
+        perspcodes = rdm_port_perspcodes(conn, database, port_schema, anlsid)
+        logger.info(f"Found PERSPCODEs in rdm_port for ANLSID {anlsid}")
+        return perspcodes
+
 @app.route('/get_databases')
 def get_databases():
     server = request.args.get('server')
@@ -548,14 +1986,8 @@ def get_databases():
             logger.error("No database credentials found in session for the selected server type")
             return Response('<option value="">Authentication error: No credentials</option>', mimetype='text/html', status=401)
         
-        # Connect and get DBs
-        engine = get_engine(server, 'master', username, password, domain)
-        if engine is None:
-            raise Exception("Failed to get database engine for server discovery.")
-
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT name FROM sys.databases WHERE database_id > 4 ORDER BY name"))
-            databases = [row[0] for row in result]
+        key = catalog_key('databases', server, 'master', username, password, domain)
+        databases = catalog_cache.get(key, lambda: load_databases(server, username, password, domain))
         
         options = ['<option value="">-- Select Database --</option>']
         options.extend([f'<option value="{db}">{db}</option>' for db in databases])
@@ -566,6 +1998,7 @@ def get_databases():
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Database error in get_databases: {error_msg}", exc_info=True)
+        forget_failed_catalogs(server, e)
         
         if "Login failed for user" in error_msg:
             return Response('<option value="">Authentication failed</option>', mimetype='text/html', status=401)
@@ -587,19 +2020,8 @@ def get_anlsids():
         if not username or not password:
              return Response('<option value="">Authentication error</option>', mimetype='text/html', status=401)
 
-        engine = get_engine(server, database, username, password, domain)
-        
-        anlsids = None
-
-        with engine.connect() as conn:
-            try:
-                query = text(f"SELECT DISTINCT ID, NAME, CURR, PERIL FROM [{database}].[dbo].[rdm_analysis] ORDER BY ID")
-                result = conn.execute(query)
-                anlsids = [(row[0], row[1], row[2], row[3]) for row in result]
-                logger.info("Found ANLSIDs with full details from 'dbo.rdm_analysis'")
-            except Exception as e:
-                logger.warning(f"Could not get full details from 'rdm_analysis': {e}. Falling back to ANLSID from rdm_port.")
-                
+        key = catalog_key('anlsids', server, database, username, password, domain)
+        anlsids = catalog_cache.get(key, lambda: load_anlsids(server, database, username, password, domain))
         
         if anlsids is None or not anlsids:
             return Response('<option value="">No ANLSIDs found</option>', mimetype='text/html')
@@ -616,6 +2038,7 @@ def get_anlsids():
 
     except Exception as e:
         logger.error(f"Error fetching ANLSIDs: {e}")
+        forget_failed_catalogs(server, e)
         return Response(f'<option value="">Error loading ANLSIDs</option>', status=500, mimetype='text/html')
 
 @app.route('/get_perspcodes')
@@ -632,28 +2055,8 @@ def get_perspcodes():
         if not username or not password:
              return Response('<option value="">Authentication error</option>', mimetype='text/html', status=401)
 
-        engine = get_engine(server, database, username, password, domain)
-        
-        perspcodes = None
-        schemas_to_try = ['dbo', 'plt']
-
-        with engine.connect() as conn:
-            for schema in schemas_to_try:
-                try:
-                    if server == 'DATABRIDGE':
-                        query = text(f"SELECT DISTINCT PERSPCODE FROM [{database}].[plt].[rdm_port] WHERE ANLSID = :anlsid ORDER BY PERSPCODE")
-                    else:
-                        query = text(f"SELECT DISTINCT PERSPCODE FROM [{database}].[{schema}].[rdm_anlspersp] WHERE ANLSID = :anlsid ORDER BY PERSPCODE")
-                    result = conn.execute(query, {'anlsid': anlsid})
-                    perspcodes = [row[0] for row in result]
-                    logger.info(f"Found PERSPCODEs in schema '{schema}' for ANLSID {anlsid}")
-                    break
-                except ProgrammingError as e:
-                    if 'invalid object name' in str(e).lower():
-                        logger.warning(f"Table 'rdm_anlspersp' not found in schema '{schema}'. Trying next.")
-                        continue
-                    else:
-                        raise
+        key = catalog_key('perspcodes', server, database, username, password, domain, anlsid)
+        perspcodes = catalog_cache.get(key, lambda: load_perspcodes(server, database, anlsid, username, password, domain))
 
         if perspcodes is None:
              return Response('<option value="">No PERSPCODEs found</option>', mimetype='text/html')
@@ -664,10 +2067,12 @@ def get_perspcodes():
 
     except Exception as e:
         logger.error(f"Error fetching PERSPCODEs: {e}")
+        forget_failed_catalogs(server, e)
         return Response(f'<option value="">Error loading PERSPCODEs</option>', status=500, mimetype='text/html')
 
 
 @app.route('/convert_csv', methods=['POST'])
+@traced_route('convert_csv')
 def convert_csv():
     try:
         if 'file' not in request.files:
@@ -680,51 +2085,110 @@ def convert_csv():
         if not file.filename.endswith('.csv'):
             return jsonify({'error': 'Please upload a CSV file'}), 400
         
+        try:
+            output_format = resolve_output_format(request.form.get('format') or app.config['OUTPUT_FORMAT'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         logger.info(f"Processing file: {file.filename}")
-        
-        #  read CSV file
-        df = pd.read_csv(file)
-        logger.info(f"CSV loaded with shape: {df.shape}, columns: {df.columns.tolist()}")
-        
-        # Convert to YLT
-        ylt_df = convert_csv_plt_to_ylt(df)
-        
-        # calculate AAL
-        numeric_rows = ylt_df[pd.to_numeric(ylt_df.iloc[:, 0], errors='coerce').notna()].copy()
-        if len(numeric_rows) > 0:
-            numeric_rows.columns = ['intYear', 'dblLoss', 'CAT', 'zero', 'rate', 'intEvent']
-            numeric_rows['dblLoss'] = pd.to_numeric(numeric_rows['dblLoss'], errors='coerce')
-            numeric_rows['intYear'] = pd.to_numeric(numeric_rows['intYear'], errors='coerce')
-            max_year = numeric_rows['intYear'].max()
-            total_loss = numeric_rows['dblLoss'].sum()
-            aal = total_loss / max_year if max_year > 0 else 0
-        else:
-            aal = 0
-        
-        #  to CSV string
-        output = io.StringIO()
-        ylt_df.to_csv(output, index=False, header=False)
-        csv_content = output.getvalue()
+
+        # queue or refuse the conversion when it would not fit next to the ones already running
+        with admission.admit(upload_memory_estimate(request.content_length)):
+            if app.config['CSV_STREAMING']:
+                # Convert to YLT without loading the whole upload
+                ylt_df = convert_csv_stream_to_ylt(file.stream)
+            else:
+                #  read CSV file
+                with stage('parse CSV') as counter:
+                    df = pd.read_csv(file)
+                    counter['rows'] = len(df)
+                logger.info(f"CSV loaded with shape: {df.shape}, columns: {df.columns.tolist()}")
+
+                # Convert to YLT
+                ylt_df = convert_csv_plt_to_ylt(df)
+
+            # AAL, std and EP points
+            with stage('metrics'):
+                metrics = ylt_metrics(ylt_df)
         
         # filename
         output_filename = file.filename.replace('PLT', 'YLT').replace('.csv', '_IFM.csv')
         if 'YLT' not in output_filename:
             output_filename = output_filename.replace('.csv', '_YLT_IFM.csv')
         
-        return jsonify({
-            'success': True,
-            'filename': output_filename,
-            'data': csv_content,
-            'rows': len(numeric_rows),
-            'aal': aal
-        })
-        
+        return conversion_response(ylt_df, output_filename, metrics, request.form.get('mode'), output_format)
+
+    except AdmissionRejected as e:
+        logger.warning(f"CSV conversion not admitted: {e}")
+        return admission_response(e)
     except Exception as e:
         logger.error(f"CSV conversion error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/download_result/<result_id>')
+def download_result(result_id):
+    purge_results()
+    with _results_lock:
+        record = _results.get(result_id)
+    result_file = None
+    if record is not None and record['owner'] == session_owner():
+        try:
+            result_file = open(record['path'], 'rb')
+        except FileNotFoundError:
+            pass
+    if result_file is None:
+        return jsonify({'error': 'Result not found or expired. Please convert again.'}), 404
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{record["filename"]}"',
+        'Content-Length': str(os.fstat(result_file.fileno()).st_size),
+        'X-YLT-Rows': str(record['stats'].get('rows', '')),
+        'X-YLT-AAL': str(record['stats'].get('aal', '')),
+    }
+    blocks = traced_stream(result_file_blocks(result_id, result_file), 'download', rows=record['rows'])
+    return Response(blocks, mimetype=output_mimetype(record['format']), headers=headers)
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify({'success': True, 'enabled': app.config['RESULT_CACHE'], **result_cache.stats(), 'catalog': catalog_cache.stats()})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    cache = result_cache.stats()
+    lines = [
+        '# HELP plt_ylt_result_cache_lookups_total Result cache lookups by outcome.',
+        '# TYPE plt_ylt_result_cache_lookups_total counter',
+        f'plt_ylt_result_cache_lookups_total{{outcome="hit"}} {cache["hits"]}',
+        f'plt_ylt_result_cache_lookups_total{{outcome="miss"}} {cache["misses"]}',
+        '# HELP plt_ylt_result_cache_bytes Size of the on-disk result cache.',
+        '# TYPE plt_ylt_result_cache_bytes gauge',
+        f'plt_ylt_result_cache_bytes {cache["bytes"]}',
+    ]
+    catalog = catalog_cache.stats()
+    lines += [
+        '# HELP plt_ylt_catalog_cache_lookups_total Dropdown catalog lookups by outcome.',
+        '# TYPE plt_ylt_catalog_cache_lookups_total counter',
+    ] + [f'plt_ylt_catalog_cache_lookups_total{{outcome="{outcome}"}} {catalog[key]}' for outcome, key in (('hit', 'hits'), ('stale', 'stale_hits'), ('miss', 'misses'))]
+    admitted = admission.stats()
+    lines += [
+        '# HELP plt_ylt_admission_memory_bytes Memory budget for conversions and the part reserved by running ones.',
+        '# TYPE plt_ylt_admission_memory_bytes gauge',
+        f'plt_ylt_admission_memory_bytes{{kind="budget"}} {admitted["budget_bytes"]}',
+        f'plt_ylt_admission_memory_bytes{{kind="reserved"}} {admitted["reserved_bytes"]}',
+        '# HELP plt_ylt_admission_conversions Conversions running and waiting for memory.',
+        '# TYPE plt_ylt_admission_conversions gauge',
+        f'plt_ylt_admission_conversions{{state="running"}} {admitted["running"]}',
+        f'plt_ylt_admission_conversions{{state="queued"}} {admitted["queued"]}',
+        f'plt_ylt_admission_conversions{{state="waiting"}} {admitted["waiting"]}',
+        '# HELP plt_ylt_admission_decisions_total Conversions admitted and rejected by status.',
+        '# TYPE plt_ylt_admission_decisions_total counter',
+        f'plt_ylt_admission_decisions_total{{outcome="admitted"}} {admitted["admitted"]}',
+    ] + [f'plt_ylt_admission_decisions_total{{outcome="rejected_{status}"}} {count}' for status, count in sorted(admitted['rejected'].items())]
+    return Response(registry.prometheus_text() + '\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 @app.route('/logout')
 def logout():
+    forget_session_catalogs()
     session.clear()
     return redirect(url_for('index'))
 
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnBuffer:
+    # preallocated structured array that cursor.fetchmany batches are copied into, doubling when full.
+    # Datetime columns are held as objects and converted once per chunk, which pandas does far
+    # faster than NumPy converts datetime objects row by row.
+
+    def __init__(self, fields, capacity):
+        # fields is a list of (column, dtype); dtype 'datetime' for dates
+        self.fields = fields
+        self.dtype = np.dtype([(f'f{index}', object if dtype == 'datetime' else dtype) for index, (_, dtype) in enumerate(fields)])
+        self.buffer = np.empty(max(capacity, 1), dtype=self.dtype)
+        self.rows = 0
+
+    def append(self, rows):
+        end = self.rows + len(rows)
+        if end > len(self.buffer):
+            grown = np.empty(max(end, 2 * len(self.buffer)), dtype=self.dtype)
+            grown[:self.rows] = self.buffer[:self.rows]
+            self.buffer = grown
+        # a list of row tuples is converted field by field in C
+        self.buffer[self.rows:end] = rows
+        self.rows = end
+
+    def take(self):
+        # the filled rows as one contiguous array per column; the buffer starts over empty
+        filled = self.buffer[:self.rows]
+        arrays = {}
+        for index, (column, dtype) in enumerate(self.fields):
+            values = filled[f'f{index}']
+            arrays[column] = pd.to_datetime(values).array if dtype == 'datetime' else np.ascontiguousarray(values)
+        chunk = ArrayChunk(arrays, self.rows)
+        self.buffer = np.empty(len(self.buffer), dtype=self.dtype)
+        self.rows = 0
+        return chunk
+
+
+class ArrayChunk:
+    # one chunk of fetched rows as a NumPy array per column; len() is the row count, as for a DataFrame chunk
+
+    def __init__(self, arrays, rows):
+        self.arrays = arrays
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+
+def fetch_arrays(cursor, fields, chunk_rows=None, arraysize=10000):
+    # yields ArrayChunks of up to chunk_rows rows (all rows in one chunk when None) from an executed
+    # DBAPI cursor whose columns are in the order of fields; key columns must not hold NULLs
+    buffer = ColumnBuffer(fields, chunk_rows or arraysize)
+    while True:
+        size = arraysize if chunk_rows is None else min(arraysize, chunk_rows - buffer.rows)
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        buffer.append(rows)
+        if chunk_rows is not None and buffer.rows >= chunk_rows:
+            yield buffer.take()
+    if buffer.rows:
+        yield buffer.take()
@@ -0,0 +1,89 @@
+"""Time the datetime64 day-of-year rate against the Period-based one.
+
+Usage: python benchmarks/bench_day_of_year.py --rows 10000000
+equivalence_cases() feeds tests/test_day_of_year.py, which checks both give identical rates.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def legacy_rate(eventdates):
+    # the implementation before the datetime64 path
+    eventdates = pd.to_datetime(eventdates)
+    year_start = eventdates.dt.to_period('Y').dt.to_timestamp()
+    return (((eventdates - year_start).dt.days + 1) / 365.0).round(6)
+
+
+def fast_rate(eventdates, policy='legacy'):
+    return app.day_fraction(*app.eventdate_days(eventdates), policy)
+
+
+def make_dates(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # 1900-2100 covers century and 400-year leap rules, times of day included
+    seconds = rng.integers(pd.Timestamp('1900-01-01').value // 10**9, pd.Timestamp('2100-12-31 23:59:59').value // 10**9, rows)
+    return pd.Series(pd.to_datetime(seconds, unit='s'))
+
+
+def equivalence_cases(rows):
+    dates = make_dates(rows)
+
+    missing = dates.copy()
+    missing[::7] = pd.NaT
+
+    boundaries = pd.Series(pd.to_datetime([
+        '2020-01-01', '2020-02-29', '2020-12-31', '2020-12-31 23:59:59.999999999', '2021-12-31',
+        '1900-12-31', '2000-12-31', '1969-12-31 23:59:59', '1970-01-01', '1678-01-01', '2262-04-11',
+    ], format='ISO8601'))
+
+    return {
+        'random': dates,
+        'dates only': dates.dt.normalize(),
+        'with NaT': missing,
+        'all NaT': pd.Series(pd.NaT, index=range(100), dtype='datetime64[ns]'),
+        'boundaries': boundaries,
+        'strings': boundaries.dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'empty': dates.iloc[:0],
+    }
+
+
+def best_of(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    leap = pd.Series(pd.to_datetime(['2020-12-30', '2020-12-31', '2021-12-31']))
+    for policy in app.LEAP_YEAR_POLICIES:
+        print(f"{policy:7s} policy: {', '.join(f'{rate:.6f}' for rate in fast_rate(leap, policy))}  (2020-12-30, 2020-12-31, 2021-12-31)")
+
+    dates = make_dates(args.rows)
+    legacy_time = best_of(legacy_rate, dates)
+    fast_time = best_of(fast_rate, dates)
+
+    print(f"rows: {args.rows:,}")
+    print(f"to_period: {legacy_time:8.2f} s")
+    print(f"datetime64: {fast_time:7.2f} s")
+    print(f"speed-up: {legacy_time / fast_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
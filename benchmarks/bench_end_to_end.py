@@ -0,0 +1,238 @@
+"""End-to-end timings and peak memory of the CSV and SQL converters on synthetic PLTs.
+
+Usage: python benchmarks/bench_end_to_end.py --periods 10000 100000 1000000 --output results.json
+       python benchmarks/bench_end_to_end.py --periods 10000 --compare baseline.json
+
+The SQL cases run convert_sql_plt_to_ylt through SQLAlchemy against a SQLite stand-in for
+rdm_port (attached as schema 'plt'). Every case runs in a fresh process, so the peak RSS
+belongs to that case alone. The JSON also records a digest of each YLT: if a case's digest
+differs between two commits, the output changed as well as the timing. Digests of different
+cases are not comparable (the CSV path writes rate 1, float sums differ by summation order).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = ('csv', 'csv stream', 'sql server', 'sql pandas')
+
+
+def make_plt(periods, events_per_period=10, catalog=200000, duplicate_fraction=0.2, eventdate=True, seed=0):
+    # Skewed like a real PLT: event counts per period are geometric (most periods are quiet,
+    # a few are busy), a small set of events causes most losses, and some (period, event) pairs
+    # appear more than once, as they do when several locations or treaties hit the same event.
+    # An event keeps one date within a period, so MIN and 'first' of EVENTDATE agree.
+    rng = np.random.default_rng(seed)
+    counts = rng.geometric(1 / events_per_period, periods) - 1
+    period_ids = np.repeat(np.arange(1, periods + 1, dtype=np.int32), counts)
+    rows = len(period_ids)
+
+    weights = rng.lognormal(0, 2, catalog)
+    event_ids = rng.choice(np.arange(1, catalog + 1, dtype=np.int32), rows, p=weights / weights.sum())
+
+    plt = pd.DataFrame({
+        'ANLSID': np.ones(rows, dtype=np.int32),
+        'PERSPCODE': 'GU',
+        'PERIODID': period_ids,
+        'EVENTID': event_ids,
+        'LOSS': rng.lognormal(10, 2, rows),
+    })
+    if eventdate:
+        day = (period_ids.astype(np.int64) * 7919 + event_ids.astype(np.int64) * 104729) % 366
+        plt['EVENTDATE'] = pd.Timestamp('2020-01-01') + pd.to_timedelta(day, unit='D')
+
+    # the same pairs again, with their own losses
+    duplicates = plt.sample(frac=duplicate_fraction, random_state=seed)
+    duplicates['LOSS'] = rng.lognormal(8, 2, len(duplicates))
+    return pd.concat([plt, duplicates], ignore_index=True).sort_values('PERIODID', kind='stable', ignore_index=True)
+
+
+def write_csv(plt, path):
+    plt.drop(columns=['ANLSID', 'PERSPCODE']).to_csv(path, index=False)
+
+
+def write_sqlite(plt, path):
+    # typed, NOT NULL columns like rdm_port, so the SQL path picks the same compact dtypes
+    eventdate = 'EVENTDATE' in plt.columns
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE rdm_port (ANLSID INTEGER NOT NULL, PERSPCODE VARCHAR(10) NOT NULL, PERIODID INTEGER NOT NULL, "
+        "EVENTID INTEGER NOT NULL, LOSS FLOAT NOT NULL" + (", EVENTDATE DATETIME" if eventdate else "") + ")"
+    )
+    frame = plt.copy()
+    if eventdate:
+        frame['EVENTDATE'] = frame['EVENTDATE'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    placeholders = ', '.join('?' * len(frame.columns))
+    for start in range(0, len(frame), 500000):
+        chunk = frame.iloc[start:start + 500000]
+        conn.executemany(f"INSERT INTO rdm_port VALUES ({placeholders})", zip(*(chunk[col].tolist() for col in chunk.columns)))
+    conn.commit()
+    conn.close()
+
+
+def prepare(periods, events_per_period, duplicate_fraction, eventdate, seed, workdir):
+    # generates the inputs in a worker process so the benchmark process itself stays small
+    plt = make_plt(periods, events_per_period, duplicate_fraction=duplicate_fraction, eventdate=eventdate, seed=seed)
+    csv_path = os.path.join(workdir, f'PLT_{periods}.csv')
+    sqlite_path = os.path.join(workdir, f'rdm_{periods}.db')
+    write_csv(plt, csv_path)
+    write_sqlite(plt, sqlite_path)
+    return len(plt), csv_path, sqlite_path
+
+
+def in_fresh_process(func, *args):
+    # Linux keeps a process's peak RSS across fork and exec, so every worker is spawned from this small process
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def sqlite_engine(path):
+    import sqlalchemy as sa
+
+    engine = sa.create_engine('sqlite://')
+
+    @sa.event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, _):
+        dbapi_connection.execute(f"ATTACH DATABASE '{path}' AS plt")
+
+    return engine
+
+
+def run_case(case, csv_path, sqlite_path):
+    # runs in its own process; imports happen before the baseline is taken
+    import app
+    from output_formats import ifm_csv
+    from tracing import peak_rss, trace
+
+    logging.disable(logging.INFO)
+    app.app.config['RESULT_CACHE'] = False
+    engine = sqlite_engine(sqlite_path) if case.startswith('sql') else None
+
+    baseline = peak_rss()
+    started = time.perf_counter()
+    with trace(case) as case_trace:
+        if case == 'csv':
+            ylt_df = app.convert_csv_plt_to_ylt(pd.read_csv(csv_path))
+        elif case == 'csv stream':
+            with open(csv_path, 'rb') as stream:
+                ylt_df = app.convert_csv_stream_to_ylt(stream)
+        else:
+            ylt_df = app.convert_sql_plt_to_ylt(engine, 'bench', 'BENCH', 1, 'GU', aggregation=case.split()[1], use_cache=False)
+    seconds = time.perf_counter() - started
+    peak = peak_rss()
+
+    return {
+        'seconds': seconds,
+        'peak_rss_bytes': peak,
+        'baseline_rss_bytes': baseline,
+        'ylt_rows': len(ylt_df),
+        'aggregation': ylt_df.attrs.get('aggregation'),
+        'ylt_sha256': hashlib.sha256(ifm_csv(ylt_df).encode('utf-8')).hexdigest(),
+        'stages': case_trace.to_dict()['stages'],
+    }
+
+
+def measure(case, csv_path, sqlite_path, repeat):
+    # best time over fresh processes; the peak RSS is the lowest seen, the least disturbed run
+    runs = []
+    for _ in range(repeat):
+        runs.append(in_fresh_process(run_case, case, csv_path, sqlite_path))
+    best = min(runs, key=lambda run: run['seconds'])
+    peaks = [run['peak_rss_bytes'] for run in runs if run['peak_rss_bytes'] is not None]
+    best['peak_rss_bytes'] = min(peaks) if peaks else None
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(entry['case'], entry['periods'], entry['eventdate']): entry for entry in json.load(f)['results']}
+
+    print(f"\ncompared with {baseline_path}")
+    changed = 0
+    for entry in results:
+        base = baseline.get((entry['case'], entry['periods'], entry['eventdate']))
+        if base is None:
+            continue
+        speed = entry['rows_per_second'] / base['rows_per_second']
+        memory = entry['peak_rss_bytes'] / base['peak_rss_bytes'] if entry['peak_rss_bytes'] and base['peak_rss_bytes'] else float('nan')
+        same = entry['ylt_sha256'] == base['ylt_sha256']
+        changed += not same
+        print(f"{entry['case']:11s} {entry['periods']:>9,} periods  speed {speed:5.2f}x  peak memory {memory:5.2f}x  output {'same' if same else 'CHANGED'}")
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--periods', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--events-per-period', type=float, default=10)
+    parser.add_argument('--duplicates', type=float, default=0.2, help='fraction of extra rows repeating a (period, event) pair')
+    parser.add_argument('--no-eventdate', action='store_true', help='leave EVENTDATE out of the PLT')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_end_to_end.json')
+    parser.add_argument('--compare', help='earlier JSON output to compare against')
+    args = parser.parse_args()
+
+    eventdate = not args.no_eventdate
+    workdir = tempfile.mkdtemp(prefix='plt_ylt_bench_')
+    results = []
+    try:
+        for periods in args.periods:
+            rows, csv_path, sqlite_path = in_fresh_process(prepare, periods, args.events_per_period, args.duplicates, eventdate, args.seed, workdir)
+
+            for case in args.cases:
+                run = measure(case, csv_path, sqlite_path, args.repeat)
+                entry = {'case': case, 'periods': periods, 'rows': rows, 'eventdate': eventdate, 'rows_per_second': rows / run['seconds'], **run}
+                results.append(entry)
+                peak = f"{run['peak_rss_bytes'] / 2**20:8.0f} MiB" if run['peak_rss_bytes'] else '       n/a'
+                print(f"{case:11s} {periods:>9,} periods {rows:>11,} rows  {run['seconds']:8.2f} s  {entry['rows_per_second']:>12,.0f} rows/s  peak {peak}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'revision': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    # a changed digest fails the run, like the equivalence checks of the other benchmarks
+    if args.compare and compare(results, args.compare):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
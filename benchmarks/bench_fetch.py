@@ -0,0 +1,94 @@
+"""Compare the cursor-to-NumPy fetch path with read_sql_query chunks: identical YLTs and rows/s.
+
+Usage: python benchmarks/bench_fetch.py --periods 100000
+Reads rdm_port from a SQLite stand-in (see bench_end_to_end.py) the way the pandas
+aggregation path does, once per fetch path. Exits with status 1 if the YLTs differ.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from aggregation import PLTAggregator  # noqa: E402
+from bench_end_to_end import make_plt, sqlite_engine, write_sqlite  # noqa: E402
+
+
+def fetch(engine, columns, fetch_path, aggregate):
+    # one pass over rdm_port as aggregate_rdm_port_in_pandas makes it; returns (seconds, rows, ylt)
+    projection = [col for col in (columns['period'], columns['event'], columns['loss'], columns['eventdate']) if col]
+    where, params = app.build_rdm_port_where(1, 'GU')
+    query = f"SELECT {', '.join(app.quote_name(engine, col) for col in projection)} FROM {app.rdm_port_table(engine, 'bench', columns['schema'])}{where}"
+    aggregator = PLTAggregator(*projection, engine=app.app.config['AGGREGATION_ENGINE'])
+
+    started = time.perf_counter()
+    rows = 0
+    if fetch_path == 'numpy':
+        for chunk in app.read_rdm_port_arrays(engine, query, params, columns, app.rdm_port_array_fields(columns)):
+            rows += len(chunk)
+            if aggregate:
+                aggregator.add_arrays(chunk.arrays)
+    else:
+        for chunk in app.read_rdm_port_chunks(engine, query, params, columns):
+            rows += len(chunk)
+            if aggregate:
+                aggregator.add(chunk)
+    ylt_df = aggregator.result() if aggregate else None
+    return time.perf_counter() - started, rows, ylt_df
+
+
+def best_of(repeat, *args):
+    runs = [fetch(*args) for _ in range(repeat)]
+    return min(runs, key=lambda run: run[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--periods', type=int, default=100000)
+    parser.add_argument('--chunksize', type=int, default=None, help='rows per chunk (SQL_CHUNK_SIZE)')
+    parser.add_argument('--arraysize', type=int, default=None, help='rows per fetchmany (SQL_FETCH_ARRAYSIZE)')
+    parser.add_argument('--no-eventdate', action='store_true', help='leave EVENTDATE out of the PLT')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.chunksize:
+        app.app.config['SQL_CHUNK_SIZE'] = args.chunksize
+    if args.arraysize:
+        app.app.config['SQL_FETCH_ARRAYSIZE'] = args.arraysize
+
+    workdir = tempfile.mkdtemp(prefix='plt_ylt_fetch_')
+    try:
+        path = os.path.join(workdir, 'rdm.db')
+        write_sqlite(make_plt(args.periods, eventdate=not args.no_eventdate), path)
+        engine = sqlite_engine(path)
+        columns = app.resolve_rdm_port_columns(engine, 'bench', 'BENCH')
+
+        results = {}
+        for fetch_path in ('pandas', 'numpy'):
+            fetch_seconds, rows, _ = best_of(args.repeat, engine, columns, fetch_path, False)
+            total_seconds, _, ylt_df = best_of(args.repeat, engine, columns, fetch_path, True)
+            results[fetch_path] = ylt_df
+            print(f"{fetch_path:6s} {rows:>11,} rows  fetch {rows / fetch_seconds:>12,.0f} rows/s  fetch + aggregate {rows / total_seconds:>12,.0f} rows/s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        pd.testing.assert_frame_equal(results['numpy'], results['pandas'])
+    except AssertionError as e:
+        print(f"YLTs differ: {e}")
+        return 1
+    print("YLTs identical")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
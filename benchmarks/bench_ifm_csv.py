@@ -0,0 +1,101 @@
+"""Time the IFM CSV writer against DataFrame.to_csv.
+
+Usage: python benchmarks/bench_ifm_csv.py --rows 10000000
+equivalence_cases() feeds tests/test_ifm_csv.py, which checks the output is byte-identical
+to to_csv(index=False, header=False).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_formats import ifm_csv  # noqa: E402
+
+
+def make_ifm(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'intYear': np.sort(rng.integers(1, 100001, rows)).astype('int32'),
+        'dblLoss': rng.lognormal(10, 2, rows),
+        'CAT': 'CAT',
+        'zero': 0,
+        'rate': np.round(rng.integers(1, 367, rows) / 365.0, 6),
+        'intEvent': rng.integers(1, 2000001, rows),
+    })
+
+
+def equivalence_cases(rows):
+    rng = np.random.default_rng(1)
+    base = make_ifm(rows)
+
+    # float keys with gaps, as the CSV path can produce
+    float_keys = base.copy()
+    float_keys['intYear'] = float_keys['intYear'].astype(float)
+    float_keys.loc[::7, 'intYear'] = np.nan
+    float_keys.loc[::11, 'dblLoss'] = np.nan
+
+    # every float64 bit pattern class: subnormals, huge, tiny, signed zeros, infinities
+    bits = rng.integers(0, 2**63, rows, dtype=np.int64).view(np.float64)
+    extremes = base.copy()
+    extremes['dblLoss'] = np.where(np.isfinite(bits), bits, np.inf)
+    extremes.loc[::13, 'dblLoss'] = -0.0
+    extremes.loc[::17, 'dblLoss'] = -np.inf
+    extremes['rate'] = 1e16 * rng.standard_normal(rows)
+
+    no_eventdate = base.copy()
+    no_eventdate['rate'] = 1 / 365.0
+
+    signed_zero_rate = base.copy()
+    signed_zero_rate['rate'] = 0.0
+    signed_zero_rate.loc[::2, 'rate'] = -0.0
+
+    # these take the to_csv fallback, still checked for identical bytes
+    quoted = base.head(1000).copy()
+    quoted['CAT'] = 'CAT,EQ'
+    float32 = base.head(1000).copy()
+    float32['dblLoss'] = float32['dblLoss'].astype('float32')
+
+    return {
+        'typical': base,
+        'float keys with NaN': float_keys,
+        'extreme floats': extremes,
+        'constant rate': no_eventdate,
+        'signed zero rate': signed_zero_rate,
+        'quoted constant': quoted,
+        'float32 losses': float32,
+        'empty': base.iloc[:0],
+    }
+
+
+def best_of(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    ylt_df = make_ifm(args.rows)
+    to_csv_time = best_of(lambda frame: frame.to_csv(index=False, header=False), ylt_df)
+    writer_time = best_of(ifm_csv, ylt_df)
+
+    print(f"rows: {args.rows:,}")
+    print(f"DataFrame.to_csv: {to_csv_time:8.2f} s")
+    print(f"ifm_csv:          {writer_time:8.2f} s")
+    print(f"speed-up: {to_csv_time / writer_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    # in-memory cache of small catalog lookups (database, ANLSID and PERSPCODE lists).
+    # Entries younger than ttl are served as they are; older ones are still served while a
+    # background thread reloads them, up to max_age, after which the caller waits for a reload.
+
+    def __init__(self, ttl, max_age, max_entries, refresh_workers=2):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> [value, loaded_at]
+        self.loading = {}  # key -> Event set when the running load finishes
+        self.refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='catalog-refresh')
+
+    def get(self, key, loader):
+        # loader() returns the value; None (nothing found) is returned but not remembered
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and now - entry[1] < self.max_age:
+                    self.entries.move_to_end(key)
+                    if now - entry[1] < self.ttl:
+                        self.hits += 1
+                        return entry[0]
+                    self.stale_hits += 1
+                    if key not in self.refreshing:
+                        self.refreshing.add(key)
+                        self.executor.submit(self._refresh, key, loader)
+                    return entry[0]
+
+                pending = self.loading.get(key)
+                if pending is None:
+                    # this caller loads, concurrent callers for the same key wait for it
+                    pending = self.loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+            with self.lock:
+                if key not in self.entries:
+                    # the load failed or found nothing; try it ourselves
+                    continue
+
+        try:
+            value = loader()
+            self._store(key, value)
+            return value
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+
+    def _refresh(self, key, loader):
+        try:
+            self._store(key, loader())
+        except Exception as exc:
+            # keep serving the previous value until max_age
+            logger.warning(f"Background refresh of {key[0]} failed: {exc}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _store(self, key, value):
+        with self.lock:
+            if value is None:
+                self.entries.pop(key, None)
+                return
+            self.entries[key] = [value, time.monotonic()]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, match=None):
+        # drop every entry, or those whose key satisfies match(key)
+        with self.lock:
+            for key in [key for key in self.entries if match is None or match(key)]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses}
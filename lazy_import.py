@@ -0,0 +1,37 @@
+import importlib
+
+
+class LazyModule:
+    # stands in for a module until one of its attributes is first read, so importing the app does
+    # not import the data stack; importlib's per-module locks make concurrent first uses safe
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+def lazy_callable(module_name, attr):
+    # a function or class of module_name that imports the module on its first call
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), attr)(*args, **kwargs)
+    call.__name__ = call.__qualname__ = attr
+    return call
+
+
+def preload(*names):
+    # imports modules ahead of their first use, e.g. from a background thread once the server is up
+    for name in names:
+        importlib.import_module(name)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# return periods reported on the OEP/AEP curves
+RETURN_PERIODS = (2, 5, 10, 25, 50, 100, 200, 250, 500, 1000)
+
+
+def _numeric(values):
+    # typed YLTs pass straight through; object columns get the old to_numeric coercion
+    if values.dtype.kind in 'iufb':
+        return values.astype(np.float64, copy=False)
+    return pd.to_numeric(values, errors='coerce').astype(np.float64)
+
+
+def annual_losses(years, losses, n_years):
+    # per-year sum (AEP) and per-year max (OEP) over years 1..n_years; years without events count as zero
+    index = years.astype(np.int64) - 1
+    in_range = (index >= 0) & (index < n_years)
+    if not in_range.all():
+        index, losses = index[in_range], losses[in_range]
+
+    aggregate = np.bincount(index, weights=losses, minlength=n_years)
+    occurrence = np.zeros(n_years, dtype=np.float64)
+    if len(index) == 0:
+        return aggregate, occurrence
+
+    if np.all(index[1:] >= index[:-1]):
+        # converted YLTs come out ordered by year, so the max is a single reduceat
+        starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))
+        occurrence[index[starts]] = np.maximum.reduceat(losses, starts)
+        np.maximum(occurrence, 0, out=occurrence)
+    else:
+        np.maximum.at(occurrence, index, losses)
+    return aggregate, occurrence
+
+
+def exceedance_points(annual, return_periods):
+    # empirical loss at each return period (the n/rp-th largest year) and the mean of the years at or above it
+    ranked = np.sort(annual)[::-1]
+    tail_means = np.cumsum(ranked) / np.arange(1, len(ranked) + 1)
+    ranks = np.floor(len(ranked) / np.asarray(return_periods, dtype=np.float64)).astype(np.int64)
+    # return periods longer than the simulation have no point on the curve
+    available = ranks >= 1
+    positions = np.maximum(ranks, 1) - 1
+    return np.where(available, ranked[positions], np.nan), np.where(available, tail_means[positions], np.nan)
+
+
+def _json_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def ylt_metrics(ylt_df, year_col='intYear', loss_col='dblLoss', return_periods=RETURN_PERIODS):
+    # AAL, standard deviation of the annual loss and OEP/AEP/TVaR points, in one pass over the YLT.
+    # The simulation length is the largest period id, matching how AAL has always been reported.
+    years = _numeric(ylt_df[year_col].to_numpy())
+    losses = _numeric(ylt_df[loss_col].to_numpy())
+
+    valid_year = ~np.isnan(years)
+    rows = int(valid_year.sum())
+    metrics = {'rows': rows, 'years': 0, 'aal': 0, 'std': 0, 'ep': []}
+    if rows == 0:
+        return metrics
+
+    years, losses = years[valid_year], losses[valid_year]
+    n_years = int(years.max())
+    if n_years <= 0:
+        return metrics
+
+    # missing losses are skipped, as pandas' sum did
+    valid_loss = ~np.isnan(losses)
+    if not valid_loss.all():
+        years, losses = years[valid_loss], losses[valid_loss]
+
+    aggregate, occurrence = annual_losses(years, losses, n_years)
+    aep, aep_tvar = exceedance_points(aggregate, return_periods)
+    oep, oep_tvar = exceedance_points(occurrence, return_periods)
+
+    metrics.update({
+        'years': n_years,
+        'aal': float(losses.sum() / n_years),
+        'std': float(aggregate.std()),
+        'ep': [
+            {
+                'return_period': rp,
+                'oep': _json_float(oep[i]),
+                'aep': _json_float(aep[i]),
+                'oep_tvar': _json_float(oep_tvar[i]),
+                'aep_tvar': _json_float(aep_tvar[i]),
+            }
+            for i, rp in enumerate(return_periods)
+        ],
+    })
+    return metrics
@@ -0,0 +1,235 @@
+import os
+import zlib
+
+import numpy as np
+
+# optional writers: the app runs without them and only refuses the formats that need them
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# name -> (file extension, mimetype, already compressed)
+OUTPUT_FORMATS = {
+    'csv': ('.csv', 'text/csv', False),
+    'csv.gz': ('.csv.gz', 'application/gzip', True),
+    'csv.zst': ('.csv.zst', 'application/zstd', True),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet', True),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file', False),
+}
+
+
+def resolve_output_format(name):
+    name = name or 'csv'
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{name}'. Use one of {list(OUTPUT_FORMATS)}.")
+    if name in ('parquet', 'arrow') and pa is None:
+        raise ValueError(f"Output format '{name}' requires pyarrow, which is not installed.")
+    if name == 'csv.zst' and zstandard is None:
+        raise ValueError("Output format 'csv.zst' requires zstandard, which is not installed.")
+    return name
+
+
+def output_filename(filename, output_format):
+    base = filename[:-len('.csv')] if filename.endswith('.csv') else filename
+    return base + OUTPUT_FORMATS[output_format][0]
+
+
+def output_mimetype(output_format):
+    return OUTPUT_FORMATS[output_format][1]
+
+
+def is_compressed(output_format):
+    return OUTPUT_FORMATS[output_format][2]
+
+
+def _csv_field(values):
+    # constant text for a column holding one value, a list of formatted values otherwise,
+    # or None when the column needs the generic writer (quoting, float32, mixed objects)
+    if len(values) == 0:
+        return None
+    kind = values.dtype.kind
+    if kind in 'iu':
+        if values.min() == values.max():
+            return str(values[0])
+        return list(map(str, values.tolist()))
+    if values.dtype == np.float64:
+        # repr is the shortest round-trip form, the same text numpy's astype(str) gives pandas
+        missing = np.isnan(values)
+        if missing.all():
+            return ''
+        if not missing.any() and values.min() == values.max():
+            # 0.0 and -0.0 compare equal but print differently
+            signs = np.signbit(values)
+            if signs.all() or not signs.any():
+                return repr(values[0].item())
+        formatted = list(map(repr, values.tolist()))
+        for index in np.flatnonzero(missing).tolist():
+            formatted[index] = ''
+        return formatted
+    if kind == 'O':
+        first = values[0]
+        if isinstance(first, str) and first and not any(char in first for char in ',"\r\n') and (values == first).all():
+            return first
+    return None
+
+
+def ifm_csv(ylt_df, lineterminator=os.linesep, block_rows=65536):
+    # byte-for-byte ylt_df.to_csv(index=False, header=False); formatted a block at a time so the
+    # per-value strings stay small and short-lived, like to_csv's own chunking
+    if len(ylt_df) <= block_rows:
+        return _ifm_csv_block(ylt_df, lineterminator)
+    return ''.join(_ifm_csv_block(ylt_df.iloc[start:start + block_rows], lineterminator) for start in range(0, len(ylt_df), block_rows))
+
+
+def _ifm_csv_block(ylt_df, lineterminator):
+    # numeric columns are formatted in bulk, constant columns (CAT, zero) are baked into the row template once
+    if len(ylt_df) == 0 or len(ylt_df.columns) == 0:
+        return ylt_df.to_csv(index=False, header=False, lineterminator=lineterminator)
+
+    template = []
+    columns = []
+    for name in ylt_df.columns:
+        field = _csv_field(ylt_df[name].to_numpy())
+        if field is None:
+            return ylt_df.to_csv(index=False, header=False, lineterminator=lineterminator)
+        if isinstance(field, str):
+            template.append(field.replace('{', '{{').replace('}', '}}'))
+        else:
+            template.append('{}')
+            columns.append(field)
+
+    template = ','.join(template)
+    if not columns:
+        return (template + lineterminator) * len(ylt_df)
+    return lineterminator.join(map(template.format, *columns)) + lineterminator
+
+
+def iter_csv_blocks(ylt_df, chunk_rows):
+    # same bytes as ylt_df.to_csv(index=False, header=False), without building the whole string
+    for start in range(0, len(ylt_df), chunk_rows):
+        yield ifm_csv(ylt_df.iloc[start:start + chunk_rows]).encode('utf-8')
+
+
+def _compressed_blocks(blocks, compressor):
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# IFM columns that stay float64 even when every value happens to be whole
+FLOAT_COLUMNS = ('dblLoss', 'rate')
+
+
+def _arrow_type(name, values):
+    if name in FLOAT_COLUMNS:
+        return pa.float64()
+    if values.dtype.kind == 'f':
+        present = values[~np.isnan(values)]
+        if not np.array_equal(present, np.floor(present)):
+            return pa.float64()
+        values = present
+    elif values.dtype.kind not in 'iu':
+        return pa.string()
+    # whole-number columns become int32, int64 only when the values need it
+    if len(values) and (values.min() < np.iinfo(np.int32).min or values.max() > np.iinfo(np.int32).max):
+        return pa.int64()
+    return pa.int32()
+
+
+def _arrow_column(values, arrow_type):
+    if pa.types.is_string(arrow_type):
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    if pa.types.is_floating(arrow_type):
+        return pa.array(values.astype(np.float64, copy=False))
+    mask = None
+    if values.dtype.kind == 'f':
+        # NaN keys become nulls
+        mask = np.isnan(values)
+        values = np.where(mask, 0, values)
+        mask = mask if mask.any() else None
+    return pa.array(values.astype(arrow_type.to_pandas_dtype(), copy=False), mask=mask)
+
+
+def arrow_schema(ylt_df):
+    return pa.schema([pa.field(name, _arrow_type(name, ylt_df[name].to_numpy())) for name in ylt_df.columns])
+
+
+def arrow_batches(ylt_df, schema, chunk_rows):
+    for start in range(0, len(ylt_df), chunk_rows):
+        chunk = ylt_df.iloc[start:start + chunk_rows]
+        arrays = [_arrow_column(chunk[field.name].to_numpy(), field.type) for field in schema]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _BlockSink:
+    # write-only file object that hands back whatever the Arrow writers produced since the last drain
+
+    def __init__(self):
+        self.blocks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.blocks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.blocks)
+        self.blocks = []
+        return data
+
+
+def _arrow_blocks(ylt_df, output_format, chunk_rows):
+    schema = arrow_schema(ylt_df)
+    sink = _BlockSink()
+    if output_format == 'parquet':
+        # one row group per chunk so readers can skip and memory-map by range
+        writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    else:
+        # uncompressed IPC file format, memory-mappable as written
+        writer = pa.ipc.new_file(sink, schema)
+
+    for batch in arrow_batches(ylt_df, schema, chunk_rows):
+        writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def iter_output_blocks(ylt_df, output_format, chunk_rows):
+    # bytes of the YLT in the requested format, produced chunk by chunk
+    if output_format == 'csv':
+        return iter_csv_blocks(ylt_df, chunk_rows)
+    if output_format == 'csv.gz':
+        return _compressed_blocks(iter_csv_blocks(ylt_df, chunk_rows), zlib.compressobj(6, zlib.DEFLATED, 31))
+    if output_format == 'csv.zst':
+        return _compressed_blocks(iter_csv_blocks(ylt_df, chunk_rows), zstandard.ZstdCompressor(level=3).compressobj())
+    return _arrow_blocks(ylt_df, output_format, chunk_rows)
+
+
+def write_output(ylt_df, output_format, fileobj, chunk_rows):
+    # the same bytes as iter_output_blocks, written to a file object (stored results, batch zip members)
+    for block in iter_output_blocks(ylt_df, output_format, chunk_rows):
+        fileobj.write(block)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from lazy_import import lazy_module
+
+# imported with the app at startup, so numpy and pandas load on the first cache access
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of a converted YLT changes so stale entries are never served
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps([CACHE_FORMAT_VERSION, *parts], default=str).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    # content-addressed on-disk store of converted YLT frames (.npz, one array per column)
+    # with size-bounded least-recently-used eviction
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = [str(name) for name in data['__columns__']]
+                attrs = json.loads(str(data['__attrs__']))
+                frame = pd.DataFrame({
+                    name: data[f'c{index}'].astype(object) if data[f'c{index}'].dtype.kind == 'U' else data[f'c{index}']
+                    for index, name in enumerate(columns)
+                })
+            frame.attrs.update(attrs)
+            # refresh the access time used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        except Exception as exc:
+            logger.warning(f"Discarding unreadable cache entry {key}: {exc}")
+            self._remove(path)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        arrays = {}
+        for index, name in enumerate(frame.columns):
+            values = frame[name].to_numpy()
+            if values.dtype == object:
+                if not all(isinstance(value, str) for value in values):
+                    logger.info(f"Not caching result: column {name} holds non-string objects")
+                    return
+                values = values.astype(str)
+            arrays[f'c{index}'] = values
+
+        os.makedirs(self.directory, exist_ok=True)
+        handle, partial_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as fh:
+                np.savez(fh, __columns__=np.array([str(name) for name in frame.columns]),
+                         __attrs__=np.array(json.dumps(frame.attrs, default=str)), **arrays)
+            os.replace(partial_path, self._path(key))
+        except Exception:
+            self._remove(partial_path)
+            raise
+
+        self.evict()
+
+    def entries(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.npz')]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        return entries
+
+    def evict(self):
+        with self.lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            while entries and total > self.max_bytes:
+                _, size, path = entries.pop(0)
+                logger.info(f"Evicting cached result {os.path.basename(path)} ({size:,} bytes)")
+                self._remove(path)
+                total -= size
+
+    def stats(self):
+        entries = self.entries()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,10 +1,26 @@
+import time
+STARTED = time.perf_counter()
+STARTED_AT = time.time()
+
 import threading
-import tkinter as tk
 import sys
 import os
+import json
+import socket
+import argparse
+import urllib.request
 import webbrowser
 import atexit
 
+# optional: a headless server (--serve) runs without Tk
+try:
+    import tkinter as tk
+except ImportError:
+    tk = None
+
+READY_POLL_MS = 50
+READY_TIMEOUT = 120  # seconds to wait for the server to listen before giving up
+
 def create_splash():
     """Create splash screen with minimal imports"""
     root = tk.Tk()
@@ -36,7 +52,7 @@ def create_splash():
     
     return root, status_label, progress_label
 
-def create_control_window():
+def create_control_window(url):
     """Create a small control window to stop the server"""
     control = tk.Tk()
     control.title("Server Control")
@@ -59,19 +75,100 @@ def create_control_window():
                      bg='#2c3e50', fg='#2ecc71')
     label.pack(pady=5)
     
-    url_label = tk.Label(frame, text="http://127.0.0.1:8100", 
+    url_label = tk.Label(frame, text=url, 
                          font=("Helvetica", 9), 
                          fg='#3498db', bg='#2c3e50',
                          cursor='hand2')
     url_label.pack(pady=2)
     
     # Make URL clickable
-    url_label.bind('<Button-1>', lambda e: webbrowser.open("http://127.0.0.1:8100"))
+    url_label.bind('<Button-1>', lambda e: webbrowser.open(url))
     
     return control, label
 
+def is_listening(host, port):
+    """True once the server accepts connections"""
+    try:
+        with socket.create_connection((host, port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+def parse_args():
+    """Command line; unknown arguments (added by launchers) are ignored"""
+    parser = argparse.ArgumentParser(description="PLT to YLT converter")
+    parser.add_argument('--serve', action='store_true', help="headless server: no splash, no browser")
+    parser.add_argument('--host', help="bind address (SERVER_HOST), 0.0.0.0 to serve the network")
+    parser.add_argument('--port', type=int, help="port (SERVER_PORT)")
+    parser.add_argument('--threads', type=int, help="waitress worker threads (SERVER_THREADS)")
+    # the packaged build has no console, so the report always goes to a file
+    parser.add_argument('--measure-startup', nargs='?', const=os.path.join(os.getcwd(), 'startup_time.json'), metavar='PATH',
+                        help="time the startup, write it as JSON and exit")
+    args, _ = parser.parse_known_args()
+    return args
+
+def serve_options(app, args):
+    """waitress settings from app.config (and .env), overridden on the command line"""
+    return {
+        'host': args.host or app.config['SERVER_HOST'],
+        'port': args.port or app.config['SERVER_PORT'],
+        'threads': args.threads or app.config['SERVER_THREADS'],
+        'channel_timeout': app.config['SERVER_CHANNEL_TIMEOUT'],
+        'connection_limit': app.config['SERVER_CONNECTION_LIMIT'],
+    }
+
+def local_address(options):
+    """Where this machine reaches the server, also when it binds every interface"""
+    host = options['host']
+    return ('127.0.0.1' if host in ('0.0.0.0', '::', '') else host), options['port']
+
+def serve_headless(args):
+    """Production mode: waitress in the foreground with the configured threads and timeouts"""
+    from waitress import serve
+    from app import app, preload_data_stack
+    
+    options = serve_options(app, args)
+    if app.config['ADMISSION_MAX_QUEUED'] >= options['threads']:
+        print(f"Warning: ADMISSION_MAX_QUEUED ({app.config['ADMISSION_MAX_QUEUED']}) requests waiting for memory can hold every one of the {options['threads']} threads")
+    
+    # the first conversion should not pay for importing pandas and sqlalchemy
+    threading.Thread(target=preload_data_stack, daemon=True, name='preload').start()
+    print(f"Serving on http://{options['host']}:{options['port']} with {options['threads']} threads")
+    serve(app, **options)
+
+class StartupTimer:
+    """Seconds since the process started at each startup milestone"""
+    def __init__(self):
+        self.milestones = {}
+        # time spent before run.py ran (PyInstaller unpacking, interpreter start), when psutil is bundled
+        try:
+            import psutil
+            self.milestones['python started'] = round(STARTED_AT - psutil.Process().create_time(), 3)
+        except Exception:
+            pass
+        self.offset = self.milestones.get('python started', 0.0)
+    
+    def mark(self, name):
+        self.milestones[name] = round(self.offset + time.perf_counter() - STARTED, 3)
+    
+    def write(self, path):
+        report = {'frozen': getattr(sys, 'frozen', False), 'python': sys.version.split()[0], 'milestones': self.milestones}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+
 if __name__ == '__main__':
+    args = parse_args()
+    if args.serve:
+        serve_headless(args)
+        sys.exit(0)
+    
+    report_path = args.measure_startup
+    timer = StartupTimer()
+    timer.mark('run.py started')
+    
     splash_root, status_label, progress_label = create_splash()
+    timer.mark('splash shown')
     
     def update_progress(text):
         try:
@@ -82,11 +179,17 @@ if __name__ == '__main__':
     
     update_progress("Loading server...")
     from waitress import serve
+    timer.mark('waitress imported')
     
     update_progress("Loading application...")
-    from app import app
+    from app import app, preload_data_stack
+    timer.mark('app imported')
+    
+    options = serve_options(app, args)
+    host, port = local_address(options)
+    url = f"http://{host}:{port}"
     
-    update_progress("Initializing server...")
+    update_progress("Starting server...")
     
     server_shutdown = threading.Event()
     
@@ -98,9 +201,9 @@ if __name__ == '__main__':
     
     def run_app():
         """Starts the Waitress server."""
-        print("Starting server at http://127.0.0.1:8100")
+        print(f"Starting server at {url}")
         try:
-            serve(app, host='127.0.0.1', port=8100, _quiet=False)
+            serve(app, _quiet=False, **options)
         except Exception as e:
             print(f"Server stopped: {e}")
     
@@ -108,10 +211,8 @@ if __name__ == '__main__':
     server_thread = threading.Thread(target=run_app, daemon=True)
     server_thread.start()
     
-    update_progress("Opening browser...")
-    
     # Create control window
-    control_window, status_label = create_control_window()
+    control_window, status_label = create_control_window(url)
     
     # Add buttons
     btn_frame = tk.Frame(control_window.children['!frame'], bg='#2c3e50')
@@ -128,17 +229,46 @@ if __name__ == '__main__':
     quit_btn.pack()
     
     def open_browser_and_show_control():
-        webbrowser.open("http://127.0.0.1:8100")
+        webbrowser.open(url)
         splash_root.destroy()
         control_window.deiconify()
     
+    def measure_and_exit():
+        """Times the first login page and the data stack import, then writes the report"""
+        with urllib.request.urlopen(url + '/', timeout=30) as response:
+            response.read()
+        timer.mark('login page served')
+        preload_data_stack()
+        timer.mark('data stack loaded')
+        timer.write(report_path)
+        cleanup()
+    
+    def wait_until_ready(waited=0.0):
+        """Polls the port from the Tk loop, so the splash stays responsive until the server listens"""
+        if is_listening(host, port):
+            timer.mark('server listening')
+            if report_path:
+                update_progress("Measuring startup...")
+                splash_root.after(0, measure_and_exit)
+                return
+            # the first conversion should not pay for importing pandas and sqlalchemy
+            threading.Thread(target=preload_data_stack, daemon=True, name='preload').start()
+            update_progress("Opening browser...")
+            open_browser_and_show_control()
+        elif not server_thread.is_alive() or waited > READY_TIMEOUT:
+            update_progress(f"Server did not start on port {port}")
+            splash_root.after(5000, cleanup)
+        else:
+            splash_root.after(READY_POLL_MS, wait_until_ready, waited + READY_POLL_MS / 1000)
+    
     # Handle window close
     control_window.protocol("WM_DELETE_WINDOW", cleanup)
     
     # Hide control window initially
     control_window.withdraw()
     
-    splash_root.after(800, open_browser_and_show_control)
+    update_progress("Waiting for server...")
+    splash_root.after(0, wait_until_ready)
     splash_root.mainloop()
     
     # Run control window event loop
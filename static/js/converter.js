@@ -10,7 +10,8 @@ $(document).ready(function() {
             database: $('#sqlDatabase').val(),
             table: $('#tableName').val(),
             analysis_no: $('#analysisNo').val(),
-            perspective: $('#perspective').val()
+            perspective: $('#perspective').val(),
+            mode: 'download'
         };
         
         $('#loadingSpinner').show();
@@ -45,6 +46,7 @@ $(document).ready(function() {
         
         const formData = new FormData();
         formData.append('file', fileInput.files[0]);
+        formData.append('mode', 'download');
         
         $('#loadingSpinner').show();
         $('#resultsSection').hide();
@@ -85,6 +87,7 @@ $(document).ready(function() {
                     <span class="stat-label">AAL (Average Annual Loss):</span>
                     <span class="stat-value">${result.aal.toFixed(2)}</span>
                 </div>
+                ${riskMetricsHtml(result)}
             </div>
             
             <div class="download-section">
@@ -104,6 +107,35 @@ $(document).ready(function() {
     }
 });
 
+function riskMetricsHtml(result) {
+    if (!result.ep || result.ep.length === 0) {
+        return '';
+    }
+    const format = value => value === null ? '-' : value.toLocaleString(undefined, { maximumFractionDigits: 0 });
+    const rows = result.ep.map(point => `
+        <tr>
+            <td>${point.return_period}</td>
+            <td>${format(point.oep)}</td>
+            <td>${format(point.aep)}</td>
+            <td>${format(point.oep_tvar)}</td>
+            <td>${format(point.aep_tvar)}</td>
+        </tr>
+    `).join('');
+
+    return `
+        <div class="stat-item">
+            <span class="stat-label">Std Dev (annual loss):</span>
+            <span class="stat-value">${result.std.toFixed(2)}</span>
+        </div>
+        <table class="table table-sm mt-2">
+            <thead>
+                <tr><th>Return Period</th><th>OEP</th><th>AEP</th><th>OEP TVaR</th><th>AEP TVaR</th></tr>
+            </thead>
+            <tbody>${rows}</tbody>
+        </table>
+    `;
+}
+
 // Download File Function
 function downloadFile() {
     if (!currentResultData) {
@@ -111,10 +143,13 @@ function downloadFile() {
         return;
     }
     
-    // Create blob and download
-    const blob = new Blob([currentResultData.data], { type: 'text/csv;charset=utf-8;' });
+    // streamed from the server when available, otherwise blob from the inline CSV
     const link = document.createElement('a');
-    const url = URL.createObjectURL(blob);
+    let url = currentResultData.download_url;
+    if (!url) {
+        const blob = new Blob([currentResultData.data], { type: 'text/csv;charset=utf-8;' });
+        url = URL.createObjectURL(blob);
+    }
     link.setAttribute('href', url);
     link.setAttribute('download', currentResultData.filename);
     link.style.visibility = 'hidden';
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the app modules live at the repository root and the case generators in benchmarks/, neither is a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
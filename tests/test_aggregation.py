@@ -0,0 +1,17 @@
+import pytest
+
+from aggregation import numpy_aggregate_plt, pandas_aggregate_plt
+from bench_aggregation import equivalence_cases
+
+CASES = equivalence_cases(20000)
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_numpy_kernel_matches_pandas(name):
+    plt = CASES[name]
+    expected = pandas_aggregate_plt(plt, 'PERIODID', 'EVENTID', 'LOSS', 'EVENTDATE')
+    actual = numpy_aggregate_plt(plt, 'PERIODID', 'EVENTID', 'LOSS', 'EVENTDATE')
+    assert actual is not None
+    assert expected.equals(actual)
+    # equals() does not compare index dtypes, the CSV text does
+    assert expected.to_csv() == actual.to_csv()
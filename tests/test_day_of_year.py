@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_day_of_year import equivalence_cases, fast_rate, legacy_rate
+
+CASES = equivalence_cases(20000)
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_day_of_year_rate_matches_period_rate(name):
+    dates = CASES[name]
+    expected = legacy_rate(dates).to_numpy(dtype=np.float64)
+    assert np.array_equal(fast_rate(dates), expected, equal_nan=True)
+
+
+@pytest.mark.parametrize('policy, rates', [
+    ('legacy', [1.0, 1.00274, 1.0]),
+    ('actual', [0.997268, 1.0, 1.0]),
+    ('clip', [1.0, 1.0, 1.0]),
+])
+def test_leap_year_policies(policy, rates):
+    dates = pd.Series(pd.to_datetime(['2020-12-30', '2020-12-31', '2021-12-31']))
+    assert fast_rate(dates, policy).tolist() == rates
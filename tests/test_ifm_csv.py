@@ -0,0 +1,19 @@
+import pytest
+
+from bench_ifm_csv import equivalence_cases
+from output_formats import ifm_csv, iter_csv_blocks
+
+CASES = equivalence_cases(20000)
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_ifm_csv_matches_to_csv(name):
+    frame = CASES[name]
+    assert ifm_csv(frame) == frame.to_csv(index=False, header=False)
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_csv_blocks_match_to_csv(name):
+    frame = CASES[name]
+    # a block size that does not divide the row count leaves a short last block
+    assert b''.join(iter_csv_blocks(frame, 9999)) == frame.to_csv(index=False, header=False).encode('utf-8')
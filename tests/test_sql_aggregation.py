@@ -0,0 +1,45 @@
+import logging
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from bench_end_to_end import make_plt, sqlite_engine
+
+
+@pytest.fixture
+def nullable_keys_engine(tmp_path):
+    # rdm_port with nullable key columns holding some NULL periods and events
+    plt = make_plt(2000)
+    plt['EVENTDATE'] = plt['EVENTDATE'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    plt['PERIODID'] = plt['PERIODID'].astype(object)
+    plt['EVENTID'] = plt['EVENTID'].astype(object)
+    plt.loc[::17, 'PERIODID'] = None
+    plt.loc[::23, 'EVENTID'] = None
+    path = tmp_path / 'rdm.db'
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE rdm_port (ANLSID INTEGER NOT NULL, PERSPCODE VARCHAR(10) NOT NULL, PERIODID INTEGER, "
+        "EVENTID INTEGER, LOSS FLOAT NOT NULL, EVENTDATE DATETIME)"
+    )
+    conn.executemany("INSERT INTO rdm_port VALUES (?, ?, ?, ?, ?, ?)", plt.itertuples(index=False, name=None))
+    conn.commit()
+    conn.close()
+    logging.disable(logging.INFO)
+    yield sqlite_engine(str(path))
+    logging.disable(logging.NOTSET)
+
+
+def test_server_and_pandas_aggregation_agree_on_null_keys(nullable_keys_engine):
+    results = {
+        aggregation: app.convert_sql_plt_to_ylt(nullable_keys_engine, 'bench', 'BENCH', 1, 'GU', aggregation=aggregation, use_cache=False)
+        for aggregation in ('server', 'pandas')
+    }
+    assert results['server'].attrs['aggregation'] == 'server'
+    server, pandas = (frame.reset_index(drop=True) for frame in results.values())
+    assert len(server) == len(pandas)
+    pd.testing.assert_frame_equal(server.drop(columns='dblLoss'), pandas.drop(columns='dblLoss'), check_dtype=False)
+    # sums of the same rows in another order
+    assert np.allclose(server['dblLoss'], pandas['dblLoss'])
@@ -0,0 +1,279 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# optional: psutil gives the working set on Windows, where neither the resource module nor /proc exist
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def peak_rss():
+    # highest resident set size the process has ever had, in bytes; a lifetime figure, so it says
+    # nothing about one stage or conversion once an earlier one used more. None when unavailable.
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None
+
+
+def current_rss():
+    # resident set size of the process right now in bytes, None when the platform offers no way to read it
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class TracedPeaks:
+    # tracemalloc keeps a single peak for the whole process and reset_peak() clears it for everyone, so
+    # stages share it: before each reset the peak so far is folded into every stage still open. A stage
+    # that overlapped a stage of another trace gets no peak, as the figure includes that trace's allocations.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # token -> [trace, peak so far, overlapped another trace]
+        self.open = {}
+
+    def start(self, owner):
+        with self.lock:
+            self._fold()
+            tracemalloc.reset_peak()
+            shared = False
+            for entry in self.open.values():
+                if entry[0] is not owner:
+                    entry[2] = shared = True
+            token = object()
+            self.open[token] = [owner, 0, shared]
+            return token
+
+    def stop(self, token):
+        with self.lock:
+            self._fold()
+            _, peak, shared = self.open.pop(token)
+            return None if shared else peak
+
+    def _fold(self):
+        # caller holds the lock; every open stage started at or before the last reset
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self.open.values():
+            entry[1] = max(entry[1], peak)
+
+
+_traced_peaks = TracedPeaks()
+
+
+class Trace:
+    # wall time, rows and memory per named stage of one conversion; re-entering a stage adds to it
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished = None
+        self.status = 'ok'
+        self.stages = {}
+        # parallel readers record into the same trace
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        with self.lock:
+            record = self.stages.get(name)
+            if record is None:
+                record = self.stages[name] = {'stage': name, 'seconds': 0.0, 'calls': 0, 'rows': None, 'rss_bytes': None, 'rss_delta_bytes': None, 'peak_traced_bytes': None}
+
+        # RSS is read at entry and exit: the higher of the two and the growth in between. Both are
+        # process-wide, so a conversion running alongside shows up in them.
+        token = _traced_peaks.start(self) if tracemalloc.is_tracing() else None
+        rss_before = current_rss()
+        started = time.perf_counter()
+        counter = {'rows': None}
+        try:
+            yield counter
+        finally:
+            elapsed = time.perf_counter() - started
+            rss_after = current_rss()
+            traced_peak = _traced_peaks.stop(token) if token is not None else None
+            with self.lock:
+                record['seconds'] += elapsed
+                record['calls'] += 1
+                if counter['rows'] is not None:
+                    record['rows'] = (record['rows'] or 0) + counter['rows']
+                if rss_before is not None and rss_after is not None:
+                    record['rss_bytes'] = max(record['rss_bytes'] or 0, rss_before, rss_after)
+                    record['rss_delta_bytes'] = (record['rss_delta_bytes'] or 0) + rss_after - rss_before
+                if traced_peak is not None:
+                    record['peak_traced_bytes'] = max(record['peak_traced_bytes'] or 0, traced_peak)
+
+    def finish(self, status='ok'):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+            self.status = status
+            registry.record(self)
+            logger.info(f"{self.name} trace ({status}): " + ', '.join(
+                f"{record['stage']} {record['seconds']:.2f}s" + (f" ({record['rows']:,} rows)" if record['rows'] is not None else '')
+                for record in self.stages.values()
+            ))
+
+    def to_dict(self):
+        total = (self.finished or time.perf_counter()) - self.started
+        stages = []
+        for record in self.stages.values():
+            stage = {key: value for key, value in record.items() if value is not None}
+            stage['seconds'] = round(record['seconds'], 4)
+            if record['rows'] is not None and record['seconds'] > 0:
+                stage['rows_per_second'] = round(record['rows'] / record['seconds'])
+            stages.append(stage)
+        return {'name': self.name, 'status': self.status, 'seconds': round(total, 4), 'process_peak_rss_bytes': peak_rss(), 'stages': stages}
+
+
+@contextmanager
+def trace(name):
+    # makes a Trace current for this thread so stage() calls deeper down record into it
+    current = Trace(name)
+    previous = getattr(_local, 'trace', None)
+    _local.trace = current
+    try:
+        yield current
+    except BaseException:
+        current.finish('error')
+        raise
+    else:
+        current.finish()
+    finally:
+        _local.trace = previous
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def attached(current):
+    # lets a worker thread record stages into a trace started on another thread; stage times of
+    # concurrent workers add up, so they can exceed the trace's wall time
+    previous = getattr(_local, 'trace', None)
+    _local.trace = current
+    try:
+        yield current
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def stage(name):
+    # no-op outside a trace, so the conversion functions can be called from anywhere
+    current = current_trace()
+    if current is None:
+        yield {'rows': None}
+        return
+    with current.stage(name) as counter:
+        yield counter
+
+
+def traced_chunks(chunks, name):
+    # times each next() of a chunk iterator (a read_sql_query or read_csv reader) as one stage
+    iterator = iter(chunks)
+    while True:
+        with stage(name) as counter:
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            counter['rows'] = len(chunk)
+        yield chunk
+
+
+def traced_stream(blocks, name, rows=None):
+    # a response body generator with its own trace; the stage covers producing and sending every block
+    stream_trace = Trace(name)
+    try:
+        with stream_trace.stage('stream output') as counter:
+            yield from blocks
+            counter['rows'] = rows
+    except GeneratorExit:
+        # the client went away before the last block
+        stream_trace.finish('aborted')
+        raise
+    except BaseException:
+        stream_trace.finish('error')
+        raise
+    else:
+        stream_trace.finish()
+
+
+class TraceRegistry:
+    # process-wide totals per trace name and stage for the /metrics endpoint
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conversions = {}
+        self.stages = {}
+
+    def record(self, finished_trace):
+        with self.lock:
+            key = (finished_trace.name, finished_trace.status)
+            count, seconds = self.conversions.get(key, (0, 0.0))
+            self.conversions[key] = (count + 1, seconds + finished_trace.finished - finished_trace.started)
+            for record in finished_trace.stages.values():
+                key = (finished_trace.name, record['stage'])
+                calls, seconds, rows = self.stages.get(key, (0, 0.0, 0))
+                self.stages[key] = (calls + record['calls'], seconds + record['seconds'], rows + (record['rows'] or 0))
+
+    def prometheus_text(self, prefix='plt_ylt'):
+        with self.lock:
+            conversions = dict(self.conversions)
+            stages = dict(self.stages)
+
+        lines = [
+            f'# HELP {prefix}_conversions_total Finished conversions by kind and status.',
+            f'# TYPE {prefix}_conversions_total counter',
+        ]
+        lines += [f'{prefix}_conversions_total{{kind="{kind}",status="{status}"}} {count}' for (kind, status), (count, _) in sorted(conversions.items())]
+        lines += [
+            f'# HELP {prefix}_conversion_seconds_total Wall time spent in finished conversions.',
+            f'# TYPE {prefix}_conversion_seconds_total counter',
+        ]
+        lines += [f'{prefix}_conversion_seconds_total{{kind="{kind}",status="{status}"}} {seconds:.6f}' for (kind, status), (_, seconds) in sorted(conversions.items())]
+
+        for metric, index, help_text in (
+            ('stage_calls_total', 0, 'Times each conversion stage ran.'),
+            ('stage_seconds_total', 1, 'Wall time per conversion stage.'),
+            ('stage_rows_total', 2, 'Rows processed per conversion stage.'),
+        ):
+            lines += [f'# HELP {prefix}_{metric} {help_text}', f'# TYPE {prefix}_{metric} counter']
+            for (kind, stage_name), values in sorted(stages.items()):
+                value = f'{values[index]:.6f}' if isinstance(values[index], float) else values[index]
+                lines.append(f'{prefix}_{metric}{{kind="{kind}",stage="{stage_name}"}} {value}')
+
+        rss = peak_rss()
+        if rss is not None:
+            lines += [
+                f'# HELP {prefix}_process_peak_rss_bytes Peak resident set size of the process.',
+                f'# TYPE {prefix}_process_peak_rss_bytes gauge',
+                f'{prefix}_process_peak_rss_bytes {rss}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = TraceRegistry()